@@ -0,0 +1,200 @@
+# articles.py - LactaSegura - Caché HTTP del catálogo de artículos remoto
+# Sin dependencias de Kivy. Guarda junto al caché de artículos un archivo de
+# metadatos con ETag, Last-Modified y la vigencia (max-age) de la copia local.
+import os, json, time, re, hashlib, threading
+from urllib.parse import urljoin
+
+from startup import importar  # requests se importa al primer uso de la red
+
+
+def escribir_json_atomico(path, datos):
+    """Escribe `datos` en un temporal y lo renombra: nunca deja el archivo a medias"""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def leer_json(path, defecto=None):
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return defecto
+    return defecto
+
+
+class CacheHttp:
+    """Descargas condicionales (If-None-Match / If-Modified-Since) con caché en disco.
+
+    Mientras la copia local tenga menos de `max_age` segundos no se consulta
+    la red; después se pide al servidor sólo si cambió, y un 304 cuesta unos
+    pocos bytes en lugar de la lista completa.
+    """
+    max_age_defecto = 6 * 3600
+
+    def __init__(self, cache_file, meta_file=None, max_age=None):
+        self.cache_file = cache_file
+        self.meta_file = meta_file or os.path.splitext(cache_file)[0] + ".meta.json"
+        self.max_age = self.max_age_defecto if max_age is None else max_age
+        self._session = None
+
+    @property
+    def session(self):
+        # Una sola sesión reutiliza las conexiones (keep-alive) entre descargas
+        if self._session is None:
+            requests = importar("requests")
+            if requests is None:
+                raise RuntimeError("requests package not available")
+            self._session = requests.Session()
+        return self._session
+
+    def leer(self):
+        return leer_json(self.cache_file)
+
+    def escribir(self, datos, meta=None):
+        escribir_json_atomico(self.cache_file, datos)
+        if meta is not None:
+            escribir_json_atomico(self.meta_file, meta)
+
+    def meta(self):
+        meta = leer_json(self.meta_file, {})
+        return meta if isinstance(meta, dict) else {}
+
+    def vigente(self, url):
+        meta = self.meta()
+        if meta.get("url") != url or not os.path.exists(self.cache_file):
+            return False
+        return time.time() - meta.get("descargado", 0) < meta.get("max_age", self.max_age)
+
+    def _max_age(self, resp):
+        control = resp.headers.get("Cache-Control", "")
+        m = re.search(r"max-age=(\d+)", control)
+        return int(m.group(1)) if m else self.max_age
+
+    def obtener(self, url, timeout=6, forzar=False, validar=None):
+        """Devuelve los datos nuevos, o None si la copia en caché sigue siendo válida"""
+        if not forzar and self.vigente(url):
+            return None
+        meta = self.meta()
+        headers = {}
+        if meta.get("url") == url and os.path.exists(self.cache_file):
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        resp = self.session.get(url, headers=headers, timeout=timeout)
+        if resp.status_code == 304:
+            meta.update(descargado=time.time(), max_age=self._max_age(resp))
+            escribir_json_atomico(self.meta_file, meta)
+            return None
+        resp.raise_for_status()
+        datos = resp.json()
+        if validar:
+            validar(datos)
+        self.escribir(datos, {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "descargado": time.time(),
+            "max_age": self._max_age(resp),
+        })
+        return datos
+
+
+def normalizar_pagina(datos):
+    """Acepta el formato antiguo (lista completa) o una página del catálogo.
+
+    Página: {"items": [{"id", "title", "source", ...}], "next": url o null,
+    "summary_url": "https://.../articulos/{id}"}. Devuelve (items, siguiente, plantilla).
+    """
+    if isinstance(datos, list):
+        return datos, None, None
+    if isinstance(datos, dict) and isinstance(datos.get("items"), list):
+        return datos["items"], datos.get("next"), datos.get("summary_url")
+    raise ValueError("Remote data is not a list or page of articles")
+
+
+class CatalogoArticulos:
+    """Catálogo remoto paginado: índice liviano por páginas y resúmenes bajo demanda.
+
+    La primera página pasa por la caché HTTP; las siguientes se piden al
+    desplazarse. El resumen completo de un artículo se descarga sólo al
+    abrirlo y se guarda en `resumen_dir`, un archivo por artículo.
+    """
+
+    def __init__(self, cache, resumen_dir="lactasegura_resumenes"):
+        self.cache = cache
+        self.resumen_dir = resumen_dir
+        self.items = []
+        self.siguiente = None
+        self.plantilla_resumen = None
+        self._lock = threading.Lock()
+        self._cargando = False
+
+    def reiniciar(self, datos, url=None):
+        """Reemplaza el catálogo con la primera página (o la lista completa antigua)"""
+        items, siguiente, plantilla = normalizar_pagina(datos)
+        if url:
+            siguiente = siguiente and urljoin(url, siguiente)
+            plantilla = plantilla and urljoin(url, plantilla)
+        with self._lock:
+            self.items = list(items)
+            self.siguiente = siguiente
+            self.plantilla_resumen = plantilla
+        return self.items
+
+    def hay_mas(self):
+        return bool(self.siguiente)
+
+    def cargar_mas(self, timeout=6):
+        """Descarga la página siguiente y devuelve sus artículos ([] si no hay o ya se está cargando)"""
+        with self._lock:
+            if self._cargando or not self.siguiente:
+                return []
+            self._cargando = True
+            url = self.siguiente
+        try:
+            resp = self.cache.session.get(url, timeout=timeout)
+            resp.raise_for_status()
+            items, siguiente, plantilla = normalizar_pagina(resp.json())
+            siguiente = siguiente and urljoin(url, siguiente)
+            plantilla = plantilla and urljoin(url, plantilla)
+            with self._lock:
+                self.items.extend(items)
+                self.siguiente = siguiente
+                self.plantilla_resumen = plantilla or self.plantilla_resumen
+            return items
+        finally:
+            self._cargando = False
+
+    def _archivo_resumen(self, art_id):
+        nombre = hashlib.sha1(str(art_id).encode("utf-8")).hexdigest()[:20] + ".json"
+        return os.path.join(self.resumen_dir, nombre)
+
+    def resumen_en_cache(self, articulo):
+        if articulo.get("summary"):
+            return articulo["summary"]
+        datos = leer_json(self._archivo_resumen(articulo.get("id")))
+        return datos.get("summary") if isinstance(datos, dict) else None
+
+    def resumen(self, articulo, timeout=6):
+        """Texto del resumen: del propio ítem, de la caché en disco o descargado"""
+        texto = self.resumen_en_cache(articulo)
+        if texto is not None:
+            return texto
+        url = articulo.get("summary_url")
+        if not url and self.plantilla_resumen:
+            url = self.plantilla_resumen.replace("{id}", str(articulo.get("id")))
+        if not url:
+            return ""
+        resp = self.cache.session.get(url, timeout=timeout)
+        resp.raise_for_status()
+        datos = resp.json()
+        texto = datos.get("summary", "") if isinstance(datos, dict) else str(datos)
+        os.makedirs(self.resumen_dir, exist_ok=True)
+        escribir_json_atomico(self._archivo_resumen(articulo.get("id")), {"id": articulo.get("id"), "summary": texto})
+        return texto
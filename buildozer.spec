@@ -7,7 +7,7 @@ package.domain = org.example
 source.dir = .
 source.include_exts = py,kv,json,png,jpg,txt
 version = 0.1
-requirements = python3,kivy==2.3.1,requests,plyer,kivy_garden.graph
+requirements = python3,sqlite3,kivy==2.3.1,requests,plyer,kivy_garden.graph
 orientation = portrait
 fullscreen = 0
 presplash.filename =
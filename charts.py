@@ -0,0 +1,97 @@
+# charts.py - LactaSegura - Series de los gráficos del historial
+# Sin dependencias de Kivy. Guarda los puntos de cada serie, agrega sólo los
+# nuevos, reduce la serie a la resolución de pantalla (LTTB) y calcula ejes.
+import math
+
+
+def lttb(puntos, umbral):
+    """Largest-Triangle-Three-Buckets: reduce `puntos` a `umbral` conservando la forma"""
+    n = len(puntos)
+    if umbral >= n or umbral < 3:
+        return list(puntos)
+    muestreados = [puntos[0]]
+    tam = (n - 2) / (umbral - 2)
+    a = 0
+    for i in range(umbral - 2):
+        # Promedio del cubo siguiente: tercer vértice del triángulo
+        inicio_sig = int((i + 1) * tam) + 1
+        fin_sig = min(int((i + 2) * tam) + 1, n)
+        cuenta = fin_sig - inicio_sig
+        px = sum(p[0] for p in puntos[inicio_sig:fin_sig]) / cuenta
+        py = sum(p[1] for p in puntos[inicio_sig:fin_sig]) / cuenta
+        ax, ay = puntos[a]
+        mejor, mejor_area = inicio_sig - 1, -1.0
+        for j in range(int(i * tam) + 1, inicio_sig):
+            bx, by = puntos[j]
+            area = abs((ax - px) * (by - ay) - (ax - bx) * (py - ay))
+            if area > mejor_area:
+                mejor, mejor_area = j, area
+        muestreados.append(puntos[mejor])
+        a = mejor
+    muestreados.append(puntos[-1])
+    return muestreados
+
+
+def _numero_redondo(valor):
+    """1, 2, 5 o 10 por una potencia de 10, lo más cercano a `valor`"""
+    if valor <= 0:
+        return 1.0
+    potencia = 10 ** math.floor(math.log10(valor))
+    for factor in (1, 2, 5, 10):
+        if valor <= factor * potencia:
+            return factor * potencia
+    return 10 * potencia
+
+
+def ejes(minimo, maximo, marcas=5):
+    """(desde, hasta, paso) con límites redondos que contienen [minimo, maximo]"""
+    if minimo is None:
+        return 0.0, 1.0, 1.0
+    if maximo - minimo < 1e-9:
+        minimo, maximo = minimo - 1, maximo + 1
+    paso = _numero_redondo((maximo - minimo) / marcas)
+    return math.floor(minimo / paso) * paso, math.ceil(maximo / paso) * paso, paso
+
+
+class SerieGrafico:
+    """Puntos (x, y) de un gráfico con límites y versión reducida en caché.
+
+    `agregar` sólo toca los puntos nuevos; la reducción LTTB se recalcula una
+    vez por cambio y por ancho, no en cada entrada a la pantalla.
+    """
+
+    def __init__(self):
+        self.puntos = []
+        self.min_x = self.max_x = self.min_y = self.max_y = None
+        self._reducida = None  # (umbral, puntos)
+
+    def __len__(self):
+        return len(self.puntos)
+
+    def limpiar(self):
+        self.puntos = []
+        self.min_x = self.max_x = self.min_y = self.max_y = None
+        self._reducida = None
+
+    def agregar(self, puntos):
+        for x, y in puntos:
+            if self.min_x is None:
+                self.min_x = self.max_x = x
+                self.min_y = self.max_y = y
+            else:
+                self.min_x, self.max_x = min(self.min_x, x), max(self.max_x, x)
+                self.min_y, self.max_y = min(self.min_y, y), max(self.max_y, y)
+            self.puntos.append((x, y))
+        if puntos:
+            self._reducida = None
+
+    def reducida(self, umbral):
+        if self._reducida is None or self._reducida[0] != umbral:
+            self._reducida = (umbral, lttb(self.puntos, umbral))
+        return self._reducida[1]
+
+    def ejes_x(self):
+        return ejes(self.min_x, self.max_x)
+
+    def ejes_y(self):
+        return ejes(self.min_y, self.max_y)
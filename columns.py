@@ -0,0 +1,161 @@
+# columns.py - LactaSegura - Columnas numéricas del historial en un archivo binario
+# Sin dependencias de Kivy. Copia del historial sólo con los números (fecha en
+# segundos epoch, peso, talla, edad e IMC) para gráficos y estadísticas: se
+# abre con mmap y cada columna es un memoryview de floats, sin copiar ni parsear.
+import os, mmap, struct
+from array import array
+from imc import numero
+from models import momento
+
+COLUMNAS = ("momento", "peso_kg", "talla_cm", "edad_meses", "imc")
+_MAGIA = b"LSCOLS01"
+# magia, columnas, filas, capacidad, contador de cambios del historial, serie (cambia al reconstruir)
+_CABECERA = struct.Struct("<8sIxxxxqqqq")
+_TAM_CABECERA = 64
+_VALOR = struct.Struct("<d")
+_NAN = float("nan")
+
+
+def valores_columnas(fecha, peso_kg, talla_cm, edad_meses, imc):
+    """Valores de una medición en el orden de COLUMNAS; NaN donde falta un número"""
+    valores = (momento(fecha), numero(peso_kg), numero(talla_cm), numero(edad_meses), numero(imc))
+    return tuple(_NAN if v is None else v for v in valores)
+
+
+def fila_columnas(calculo):
+    """valores_columnas de una entrada de historial (dict)"""
+    return valores_columnas(*(calculo.get(c) for c in ("fecha", "peso_kg", "talla_cm", "edad_meses", "imc")))
+
+
+def _capacidad(filas):
+    capacidad = 64
+    while capacidad < filas:
+        capacidad *= 2
+    return capacidad
+
+
+class ColumnasHistorial:
+    """Archivo de columnas: cabecera de 64 bytes y una columna de doubles por campo.
+
+    Cada columna tiene lugar para `capacidad` filas, así que agregar una
+    medición escribe cinco valores y la cabecera sin mover nada; cuando se
+    llena (o el historial cambió de otra forma) se reconstruye completo. La
+    cabecera guarda la cantidad de filas y el contador de cambios de la tabla
+    (BaseDatos.contador), con el que RepositorioHistorial detecta si está
+    desactualizado.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def cabecera(self):
+        """{"filas", "capacidad", "version", "serie"}, o None si no existe o no es válido"""
+        try:
+            with open(self.path, "rb") as f:
+                datos = f.read(_CABECERA.size)
+        except OSError:
+            return None
+        if len(datos) < _CABECERA.size:
+            return None
+        magia, ncols, filas, capacidad, version, serie = _CABECERA.unpack(datos)
+        if magia != _MAGIA or ncols != len(COLUMNAS) or not 0 <= filas <= capacidad:
+            return None
+        return {"filas": filas, "capacidad": capacidad, "version": version, "serie": serie}
+
+    def reconstruir(self, columnas, version):
+        """Reescribe el archivo con `columnas` (un array('d') por campo de COLUMNAS)"""
+        filas = len(columnas[0])
+        capacidad = _capacidad(filas)
+        serie = int.from_bytes(os.urandom(8), "little", signed=True)
+        relleno = array("d", bytes(8 * (capacidad - filas)))
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_CABECERA.pack(_MAGIA, len(COLUMNAS), filas, capacidad, version, serie)
+                    .ljust(_TAM_CABECERA, b"\0"))
+            for columna in columnas:
+                columna.tofile(f)
+                relleno.tofile(f)
+            # En disco antes del rename: un corte no puede dejar una cabecera al día sin sus columnas
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def agregar(self, fila, version):
+        """Agrega una fila en su lugar; False si no hay archivo válido o no queda capacidad"""
+        cab = self.cabecera()
+        if cab is None or cab["filas"] >= cab["capacidad"]:
+            return False
+        filas, capacidad = cab["filas"], cab["capacidad"]
+        with open(self.path, "r+b") as f:
+            for n, valor in enumerate(fila):
+                f.seek(_TAM_CABECERA + 8 * (n * capacidad + filas))
+                f.write(_VALOR.pack(valor))
+            # Primero los valores y después la cabecera: un corte a mitad no deja filas a medias
+            f.flush()
+            os.fsync(f.fileno())
+            f.seek(0)
+            f.write(_CABECERA.pack(_MAGIA, len(COLUMNAS), filas + 1, capacidad, version, cab["serie"]))
+        return True
+
+    def abrir(self):
+        """LectorColumnas sobre el archivo actual, o None si no existe o no es válido"""
+        cab = self.cabecera()
+        if cab is None:
+            return None
+        with open(self.path, "rb") as f:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return LectorColumnas(mapa, cab)
+
+
+class LectorColumnas:
+    """Vista de sólo lectura: `columna(nombre)` es un memoryview de floats de largo `filas`.
+
+    Las filas que se agreguen después de abrirlo no se ven; el archivo
+    reemplazado por una reconstrucción sigue siendo válido mientras se use.
+    """
+
+    def __init__(self, mapa, cab):
+        self._mapa = mapa
+        self.filas = cab["filas"]
+        self.version = cab["version"]
+        self.serie = cab["serie"]
+        self._capacidad = cab["capacidad"]
+
+    def columna(self, nombre):
+        inicio = _TAM_CABECERA + 8 * COLUMNAS.index(nombre) * self._capacidad
+        return memoryview(self._mapa)[inicio:inicio + 8 * self.filas].cast("d")
+
+    def cerrar(self):
+        try:
+            self._mapa.close()
+        except BufferError:
+            pass  # Todavía hay columnas en uso: el mapa se libera con ellas
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+class ColumnasEnMemoria:
+    """Misma interfaz de lectura que LectorColumnas, armada desde una lista de mediciones.
+
+    Es el respaldo cuando no hay archivo de columnas; `serie` cambia con
+    cada lista nueva, así que quien lee vuelve a empezar.
+    """
+
+    def __init__(self, mediciones):
+        self.filas = len(mediciones)
+        self.version = None
+        self.serie = id(mediciones)
+        self._columnas = {
+            nombre: [_NAN if v is None else v for v in (getattr(m, nombre) for m in mediciones)]
+            for nombre in COLUMNAS
+        }
+
+    def columna(self, nombre):
+        return self._columnas[nombre]
+
+    def cerrar(self):
+        pass
@@ -0,0 +1,235 @@
+# compaction.py - LactaSegura - Compactación de ráfagas del historial IMC
+# Sin dependencias de Kivy. Mover los controles de la calculadora guardaba un
+# cálculo por cada posición intermedia; de cada ráfaga sólo vale la última
+# medición. Se recorre el historial una sola vez y en flujo:
+#   python compaction.py lactasegura_imc_history.json compactado.json
+#   python compaction.py lactasegura.db
+# Con --codigos también convierte las interpretaciones guardadas como texto al
+# formato compacto (--ventana 0 sólo convierte, sin compactar).
+import os, sys, json, sqlite3, argparse
+from datetime import datetime
+from imc import leer_filas, migrar_entrada
+from storage import BaseDatos, _escribir_atomico, _linea
+
+# Entradas separadas por menos de esto pertenecen a la misma ráfaga; es la
+# misma espera de GuardadoDiferido, que ya evita las ráfagas nuevas
+VENTANA = 1.5
+
+
+class InformeCompactacion:
+    def __init__(self):
+        self.entradas = 0
+        self.conservadas = 0
+        self.bytes_antes = None
+        self.bytes_despues = None
+
+    @property
+    def eliminadas(self):
+        return self.entradas - self.conservadas
+
+    @property
+    def bytes_recuperados(self):
+        if self.bytes_antes is None or self.bytes_despues is None:
+            return None
+        return self.bytes_antes - self.bytes_despues
+
+    def como_dict(self):
+        return {"entradas": self.entradas, "conservadas": self.conservadas,
+                "eliminadas": self.eliminadas, "bytes_antes": self.bytes_antes,
+                "bytes_despues": self.bytes_despues, "bytes_recuperados": self.bytes_recuperados}
+
+    def texto(self):
+        lineas = [f"Entradas: {self.entradas} -> {self.conservadas} ({self.eliminadas} eliminadas)"]
+        if self.bytes_recuperados is not None:
+            lineas.append(f"Bytes: {self.bytes_antes} -> {self.bytes_despues} "
+                          f"({self.bytes_recuperados} recuperados)")
+        return "\n".join(lineas)
+
+
+def _momento(entrada):
+    try:
+        return datetime.fromisoformat(entrada["fecha"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def compactar_rafagas(entradas, ventana=VENTANA, informe=None, al_descartar=None, clave=None):
+    """Devuelve (en flujo) la última entrada de cada ráfaga de `entradas`.
+
+    Una ráfaga es una serie de entradas consecutivas separadas por menos de
+    `ventana` segundos. Sólo se guarda en memoria la entrada pendiente, así
+    que el tamaño del historial no importa. Las entradas sin fecha válida se
+    conservan tal cual y cortan la ráfaga. `al_descartar(entrada)` se llama
+    con cada entrada intermedia que se descarta. Si se da `clave(entrada)`
+    (p. ej. el bebé), un cambio de clave también corta la ráfaga.
+    """
+    if informe is None:
+        informe = InformeCompactacion()
+    pendiente = anterior = clave_anterior = None
+    for entrada in entradas:
+        informe.entradas += 1
+        momento = _momento(entrada)
+        clave_actual = clave(entrada) if clave else None
+        if pendiente is not None and (momento is None or anterior is None or clave_actual != clave_anterior
+                                      or not 0 <= momento - anterior < ventana):
+            informe.conservadas += 1
+            yield pendiente
+            pendiente = None
+        if momento is None:
+            informe.conservadas += 1
+            yield entrada
+        else:
+            if pendiente is not None and al_descartar:
+                al_descartar(pendiente)
+            pendiente = entrada
+        anterior = momento
+        clave_anterior = clave_actual
+    if pendiente is not None:
+        informe.conservadas += 1
+        yield pendiente
+
+
+def _borradas(path):
+    """Fechas marcadas como borradas en un journal JSON Lines (primera pasada)"""
+    borradas = set()
+    with open(path, "rb") as f:
+        for raw in f:
+            # Sólo se decodifican las marcas, que son pocas
+            if b'"_borrado"' in raw:
+                try:
+                    borradas.add(json.loads(raw)["_borrado"])
+                except (ValueError, KeyError):
+                    pass
+    return borradas
+
+
+def _lineas_arreglo(entradas):
+    # Mismo formato que json.dump(historial, f, ensure_ascii=False, indent=2)
+    separador = b"\n  "
+    vacio = True
+    yield b"["
+    for entrada in entradas:
+        texto = json.dumps(entrada, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+        yield separador + texto.encode("utf-8")
+        separador = b",\n  "
+        vacio = False
+    yield b"]" if vacio else b"\n]"
+
+
+def _contar_bytes(lineas, informe):
+    informe.bytes_despues = 0
+    for linea in lineas:
+        informe.bytes_despues += len(linea)
+        yield linea
+
+
+def compactar_archivo(entrada, salida=None, ventana=VENTANA, simular=False, codigos=False):
+    """Compacta un historial .json (arreglo) o .jsonl (journal) y devuelve el informe.
+
+    Sin `salida` se reemplaza `entrada` (con un temporal y os.replace, así
+    que nunca queda a medias). En los journals también se aplican y se
+    descartan las marcas de borrado. Con `codigos` cada entrada pasa al
+    formato compacto (imc.migrar_entrada). Con `simular` no se escribe nada.
+    """
+    extension = os.path.splitext(entrada)[1].lower()
+    if extension not in (".json", ".jsonl"):
+        raise ValueError(f"Formato de historial no soportado: {extension}")
+    informe = InformeCompactacion()
+    informe.bytes_antes = os.path.getsize(entrada)
+    filas = leer_filas(entrada)
+    if extension == ".jsonl":
+        borradas = _borradas(entrada)
+        if borradas:
+            filas = (fila for fila in filas if fila.get("fecha") not in borradas)
+    conservadas = compactar_rafagas(filas, ventana, informe, clave=lambda e: e.get("registro_id", ""))
+    if codigos:
+        conservadas = map(migrar_entrada, conservadas)
+    if extension == ".jsonl":
+        lineas = (_linea(fila) for fila in conservadas)
+    else:
+        lineas = _lineas_arreglo(conservadas)
+    lineas = _contar_bytes(lineas, informe)
+    if simular:
+        for _ in lineas:
+            pass
+    else:
+        _escribir_atomico(salida or entrada, lineas)
+    return informe
+
+
+def _tamano_base(path):
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+def compactar_base(db, ventana=VENTANA, simular=False, tam_lote=500):
+    """Compacta la tabla historial de `db` (BaseDatos) y devuelve el informe.
+
+    Las filas se leen en orden de fecha con una conexión propia (modo WAL: la
+    lectura no bloquea a la app) y los ids sobrantes se borran por lotes, así
+    que nunca se cargan todas en memoria. Los borrados quedan registrados
+    para la sincronización como cualquier otra baja.
+    """
+    informe = InformeCompactacion()
+    informe.bytes_antes = _tamano_base(db.path)
+    eliminar = []
+
+    def borrar():
+        with db._lock, db.conn:
+            db.conn.executemany("DELETE FROM historial WHERE id = ?", [(i,) for i in eliminar])
+        eliminar.clear()
+
+    def descartar(fila):
+        if simular:
+            return
+        eliminar.append(fila["id"])
+        if len(eliminar) >= tam_lote:
+            borrar()
+
+    lector = sqlite3.connect(db.path)
+    lector.row_factory = sqlite3.Row
+    try:
+        # Por bebé y por fecha (índice idx_historial_registro): las ráfagas nunca mezclan bebés
+        filas = lector.execute("SELECT id, fecha, registro_id FROM historial ORDER BY registro_id, fecha, id")
+        for _ in compactar_rafagas(filas, ventana, informe, descartar, clave=lambda f: f["registro_id"]):
+            pass
+    finally:
+        lector.close()
+    if simular:
+        return informe
+    if eliminar:
+        borrar()
+    if informe.eliminadas:
+        db.tocar("historial")
+        db.historial.compactar()
+        db.ejecutar("PRAGMA wal_checkpoint(TRUNCATE)")
+    informe.bytes_despues = _tamano_base(db.path)
+    return informe
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compacta las ráfagas de cálculos del historial IMC")
+    parser.add_argument("entrada", help="historial .json, journal .jsonl o base .db")
+    parser.add_argument("salida", nargs="?", help="archivo compactado (por defecto se reemplaza la entrada)")
+    parser.add_argument("--ventana", type=float, default=VENTANA,
+                        help="segundos máximos entre entradas de una misma ráfaga")
+    parser.add_argument("--codigos", action="store_true",
+                        help="guardar el código de clasificación en lugar del texto de la interpretación")
+    parser.add_argument("--simular", action="store_true", help="sólo informar, sin escribir nada")
+    args = parser.parse_args(argv)
+    if os.path.splitext(args.entrada)[1].lower() == ".db":
+        if args.salida:
+            parser.error("la base se compacta en su lugar; no se admite salida")
+        # Al abrirla, BaseDatos ya convierte las interpretaciones a código
+        db = BaseDatos(args.entrada)
+        try:
+            informe = compactar_base(db, args.ventana, args.simular)
+        finally:
+            db.cerrar()
+    else:
+        informe = compactar_archivo(args.entrada, args.salida, args.ventana, args.simular, args.codigos)
+    print(informe.texto())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
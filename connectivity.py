@@ -0,0 +1,87 @@
+# connectivity.py - LactaSegura - Monitor de conexión en segundo plano
+# Sin dependencias de Kivy: los oyentes se llaman desde el hilo del monitor,
+# la app se encarga de pasarlos al hilo principal con @mainthread.
+import socket, threading, time
+from urllib.parse import urlsplit
+
+from startup import importar  # requests se importa al primer uso de la red
+
+
+class MonitorConexion:
+    """Mantiene en caché el estado en línea/sin conexión.
+
+    Un hilo comprueba la conectividad cada `intervalo` segundos; mientras no
+    hay conexión la espera se duplica hasta `espera_maxima`. `is_online()`
+    sólo devuelve el último estado conocido: nunca toca la red ni adelanta
+    la comprobación, así la espera sin conexión se respeta aunque la app lo
+    consulte seguido. Para forzar una comprobación está `comprobar_ahora()`.
+    """
+
+    def __init__(self, url="https://www.google.com/", intervalo=30, timeout=2, espera_maxima=300):
+        self.url = url
+        self.intervalo = intervalo
+        self.timeout = timeout
+        self.espera_maxima = espera_maxima
+        self.online = None  # desconocido hasta la primera comprobación
+        self.ultima_comprobacion = 0.0
+        self._espera = intervalo
+        self._oyentes = []
+        self._evento = threading.Event()
+        self._detener = False
+        self._hilo = None
+
+    def agregar_oyente(self, callback):
+        """`callback(online)` se llama cada vez que cambia el estado"""
+        self._oyentes.append(callback)
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener = False
+        self._hilo = threading.Thread(target=self._bucle, name="MonitorConexion", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout=None):
+        self._detener = True
+        self._evento.set()
+        if self._hilo:
+            self._hilo.join(timeout)
+
+    def comprobar_ahora(self):
+        """Pide una comprobación inmediata sin esperar el resultado"""
+        self._evento.set()
+
+    def is_online(self):
+        return bool(self.online)
+
+    def _probar(self):
+        requests = importar("requests")
+        if requests is not None:
+            try:
+                requests.head(self.url, timeout=self.timeout, allow_redirects=False)
+                return True
+            except Exception:
+                return False
+        partes = urlsplit(self.url)
+        puerto = partes.port or (443 if partes.scheme == "https" else 80)
+        try:
+            with socket.create_connection((partes.hostname, puerto), timeout=self.timeout):
+                return True
+        except Exception:
+            return False
+
+    def _bucle(self):
+        while not self._detener:
+            online = self._probar()
+            self.ultima_comprobacion = time.monotonic()
+            # Con conexión se vuelve al intervalo normal; sin conexión, espera exponencial
+            self._espera = self.intervalo if online else min(self._espera * 2, self.espera_maxima)
+            if online != self.online:
+                self.online = online
+                for callback in list(self._oyentes):
+                    try:
+                        callback(online)
+                    except Exception as e:
+                        print("Error en oyente de conexión:", e)
+            self._evento.wait(self._espera)
+            self._evento.clear()
@@ -0,0 +1,236 @@
+# export.py - LactaSegura - Exportación de registros e historial en segundo plano
+# Sin dependencias de Kivy. Las filas se leen con una conexión SQLite propia
+# (modo WAL: no bloquea a la app) y se escriben a medida que llegan, así la
+# memoria no crece con la cantidad de filas.
+import os, re, csv, gzip, sqlite3, threading, zipfile
+from xml.sax.saxutils import escape
+from imc import TEXTOS
+
+
+def _fila_historial(fila):
+    # El historial guarda el código de clasificación; se exporta su texto
+    codigo = fila[-1]
+    return fila[:-1] + (TEXTOS[codigo][0] if codigo in TEXTOS else codigo,)
+
+
+# Tabla -> (encabezado, consulta, índices de columnas numéricas, conversión de cada fila o None)
+TABLAS = {
+    "registros": (
+        ["ID", "Fecha", "Nombre", "Edad (meses)", "Peso (kg)", "Observación"],
+        "SELECT id, fecha, nombre, edad_meses, peso_kg, observacion FROM registros ORDER BY id",
+        {0, 3, 4},
+        None,
+    ),
+    "historial": (
+        ["Fecha", "Registro", "Peso (kg)", "Talla (cm)", "Edad (meses)", "Sexo", "IMC", "Clasificación"],
+        "SELECT fecha, registro_id, peso_kg, talla_cm, edad_meses, sexo, imc, codigo FROM historial ORDER BY id",
+        {2, 3, 4, 6},
+        _fila_historial,
+    ),
+}
+
+# Formato -> extensión del archivo
+FORMATOS = {"csv": ".csv", "csv.gz": ".csv.gz", "xlsx": ".xlsx"}
+
+
+class EscritorCSV:
+    def __init__(self, path, encabezado, comprimir=False):
+        if comprimir:
+            self._f = gzip.open(path, "wt", encoding="utf-8", newline="")
+        else:
+            self._f = open(path, "w", encoding="utf-8", newline="")
+        self._csv = csv.writer(self._f)
+        self._csv.writerow(encabezado)
+
+    def escribir(self, fila):
+        self._csv.writerow(fila)
+
+    def cerrar(self):
+        self._f.close()
+
+
+_XML_INVALIDO = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_XLSX_PARTES = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/></Relationships>'),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="LactaSegura" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/></Relationships>'),
+}
+
+
+def _columna(n):
+    """Letra de columna de Excel (0 -> A, 26 -> AA)"""
+    letras = ""
+    n += 1
+    while n:
+        n, resto = divmod(n - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+class EscritorXLSX:
+    """Hoja XLSX mínima escrita en flujo dentro del zip (cadenas en línea, sin sharedStrings)"""
+
+    def __init__(self, path, encabezado, numericas=()):
+        self.numericas = set(numericas)
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        for nombre, contenido in _XLSX_PARTES.items():
+            self._zip.writestr(nombre, contenido)
+        self._hoja = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._hoja.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+        self._filas = 0
+        self._letras = []
+        self._pendientes = []
+        self._escribir(encabezado, numericas=())
+
+    def _celda(self, ref, valor, numerica):
+        if valor is None or valor == "":
+            return ""
+        if numerica:
+            try:
+                numero = float(str(valor).replace(",", "."))
+                if numero.is_integer():
+                    numero = int(numero)
+                return f'<c r="{ref}"><v>{numero!r}</v></c>'
+            except (ValueError, OverflowError):
+                pass
+        texto = escape(_XML_INVALIDO.sub("", str(valor)))
+        return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+    def _escribir(self, fila, numericas):
+        self._filas += 1
+        while len(self._letras) < len(fila):
+            self._letras.append(_columna(len(self._letras)))
+        celdas = "".join(
+            self._celda(f"{self._letras[i]}{self._filas}", valor, i in numericas)
+            for i, valor in enumerate(fila))
+        # Se escribe al zip en tandas: una escritura por fila es mucho más lenta
+        self._pendientes.append(f'<row r="{self._filas}">{celdas}</row>')
+        if len(self._pendientes) >= 500:
+            self._volcar()
+
+    def _volcar(self):
+        self._hoja.write("".join(self._pendientes).encode("utf-8"))
+        self._pendientes = []
+
+    def escribir(self, fila):
+        self._escribir(fila, self.numericas)
+
+    def cerrar(self):
+        self._volcar()
+        self._hoja.write(b"</sheetData></worksheet>")
+        self._hoja.close()
+        self._zip.close()
+
+
+def abrir_escritor(path, formato, encabezado, numericas=()):
+    if formato == "xlsx":
+        return EscritorXLSX(path, encabezado, numericas)
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportación desconocido: {formato}")
+    return EscritorCSV(path, encabezado, comprimir=(formato == "csv.gz"))
+
+
+class TrabajoExportacion:
+    """Exporta una tabla a `path` en un hilo propio; se puede cancelar.
+
+    `progreso(escritas, total)` se llama cada `cada` filas y
+    `al_terminar(estado, path, escritas, error)` al final, con estado "ok",
+    "cancelado" o "error". Se escribe sobre un archivo `.parcial` que sólo se
+    renombra al terminar bien: una exportación cancelada no deja nada a medias.
+    """
+
+    def __init__(self, db_path, tabla, path, formato="csv", progreso=None, al_terminar=None, cada=500):
+        self.db_path = db_path
+        self.tabla = tabla
+        self.path = path
+        self.formato = formato
+        self.progreso = progreso
+        self.al_terminar = al_terminar
+        self.cada = cada
+        self._cancelado = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._ejecutar, name="Exportacion", daemon=True)
+        self._hilo.start()
+        return self
+
+    def cancelar(self):
+        self._cancelado.set()
+
+    def activo(self):
+        return bool(self._hilo and self._hilo.is_alive())
+
+    def esperar(self, timeout=None):
+        if self._hilo:
+            self._hilo.join(timeout)
+
+    def _ejecutar(self):
+        encabezado, consulta, numericas, convertir = TABLAS[self.tabla]
+        parcial = self.path + ".parcial"
+        escritas = 0
+        estado, error = "ok", None
+        conn = None
+        escritor = None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            total = conn.execute(f"SELECT COUNT(*) FROM {self.tabla}").fetchone()[0]
+            carpeta = os.path.dirname(self.path)
+            if carpeta:
+                os.makedirs(carpeta, exist_ok=True)
+            escritor = abrir_escritor(parcial, self.formato, encabezado, numericas)
+            for fila in conn.execute(consulta):
+                if self._cancelado.is_set():
+                    estado = "cancelado"
+                    break
+                escritor.escribir(convertir(fila) if convertir else fila)
+                escritas += 1
+                if self.progreso and escritas % self.cada == 0:
+                    self.progreso(escritas, total)
+            escritor.cerrar()
+            escritor = None
+            if estado == "ok":
+                os.replace(parcial, self.path)
+                if self.progreso:
+                    self.progreso(escritas, total)
+        except Exception as e:
+            estado, error = "error", e
+        finally:
+            if escritor is not None:
+                try:
+                    escritor.cerrar()
+                except Exception:
+                    pass
+            if conn is not None:
+                conn.close()
+            if estado != "ok" and os.path.exists(parcial):
+                os.remove(parcial)
+        if self.al_terminar:
+            self.al_terminar(estado, self.path, escritas, error)
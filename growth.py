@@ -0,0 +1,196 @@
+# growth.py - LactaSegura - Patrones de crecimiento OMS (método LMS)
+# Sin dependencias de Kivy. Lee las tablas LMS de la OMS (formato de WHO Anthro:
+# bmianthro.txt, weianthro.txt, lenanthro.txt; columnas sex, age (días), l, m, s)
+# desde `directorio`. Si numpy está instalado, los lotes se calculan vectorizados;
+# se importa recién en el primer lote, así que no pesa en el arranque de la app.
+import os, math
+from array import array
+from bisect import bisect_right
+from startup import importar
+
+# Indicador -> archivo de la OMS
+ARCHIVOS = {
+    "imc": "bmianthro.txt",    # IMC para la edad
+    "peso": "weianthro.txt",   # peso para la edad
+    "talla": "lenanthro.txt",  # longitud/talla para la edad
+}
+# La OMS corrige los puntajes z extremos (|z| > 3) en los indicadores basados en peso
+_AJUSTE_EXTREMOS = {"imc", "peso"}
+_SEXOS = {"1": "M", "2": "F", "m": "M", "f": "F", "M": "M", "F": "F"}
+
+DIAS_POR_MES = 30.4375
+
+
+def meses_a_dias(meses):
+    return float(meses) * DIAS_POR_MES
+
+
+def percentil(z):
+    """Percentil (0-100) de un puntaje z en la normal estándar"""
+    return 50.0 * (1.0 + math.erf(z / math.sqrt(2.0)))
+
+
+def clasificar_imc_z(z):
+    """Código de clasificación del IMC para la edad según los puntos de corte z de la OMS"""
+    if z < -3:
+        return "bajo_severo"
+    if z < -2:
+        return "bajo"
+    if z <= 1:
+        return "normal"
+    if z <= 2:
+        return "riesgo_sobrepeso"
+    if z <= 3:
+        return "sobrepeso"
+    return "obesidad"
+
+
+class TablaLMS:
+    """Columnas L, M y S de un indicador y sexo, ordenadas por edad en días"""
+    __slots__ = ("edades", "l", "m", "s")
+
+    def __init__(self):
+        self.edades = array("d")
+        self.l = array("d")
+        self.m = array("d")
+        self.s = array("d")
+
+    def agregar(self, edad, l, m, s):
+        self.edades.append(edad)
+        self.l.append(l)
+        self.m.append(m)
+        self.s.append(s)
+
+    def ordenar(self):
+        filas = sorted(zip(self.edades, self.l, self.m, self.s))
+        for n, columna in enumerate((self.edades, self.l, self.m, self.s)):
+            columna[:] = array("d", (fila[n] for fila in filas))
+
+    def lms(self, edad_dias):
+        """L, M y S interpolados linealmente a `edad_dias` (acotada al rango de la tabla)"""
+        edades = self.edades
+        if edad_dias <= edades[0]:
+            return self.l[0], self.m[0], self.s[0]
+        if edad_dias >= edades[-1]:
+            return self.l[-1], self.m[-1], self.s[-1]
+        i = bisect_right(edades, edad_dias) - 1
+        f = (edad_dias - edades[i]) / (edades[i + 1] - edades[i])
+        return (self.l[i] + (self.l[i + 1] - self.l[i]) * f,
+                self.m[i] + (self.m[i + 1] - self.m[i]) * f,
+                self.s[i] + (self.s[i + 1] - self.s[i]) * f)
+
+
+def _z_lms(x, l, m, s, ajustar):
+    if l == 0:
+        z = math.log(x / m) / s
+    else:
+        z = ((x / m) ** l - 1.0) / (l * s)
+    if ajustar and abs(z) > 3:
+        # Puntaje z restringido de la OMS: fuera de ±3 DE se extrapola linealmente
+        sd = lambda k: m * (1.0 + l * s * k) ** (1.0 / l) if l else m * math.exp(s * k)
+        if z > 3:
+            z = 3.0 + (x - sd(3)) / (sd(3) - sd(2))
+        else:
+            z = -3.0 + (x - sd(-3)) / (sd(-2) - sd(-3))
+    return z
+
+
+class MotorCrecimiento:
+    """Puntajes z y percentiles de la OMS para IMC, peso y talla según edad y sexo.
+
+    Las tablas se cargan la primera vez que se usan. Sin las tablas de un
+    indicador, `disponible()` es falso y la app vuelve a sus puntos de corte.
+    """
+
+    def __init__(self, directorio="who_growth"):
+        self.directorio = directorio
+        self._tablas = None
+
+    def _cargar(self):
+        tablas = {}
+        for indicador, archivo in ARCHIVOS.items():
+            path = os.path.join(self.directorio, archivo)
+            if not os.path.exists(path):
+                continue
+            try:
+                tablas.update(self._leer(indicador, path))
+            except Exception as e:
+                print(f"Error al leer la tabla OMS {archivo}:", e)
+        self._tablas = tablas
+
+    @staticmethod
+    def _leer(indicador, path):
+        tablas = {}
+        with open(path, "r", encoding="utf-8") as f:
+            columnas = [c.strip().lower() for c in f.readline().split()]
+            i_sexo, i_edad = columnas.index("sex"), columnas.index("age")
+            i_l, i_m, i_s = columnas.index("l"), columnas.index("m"), columnas.index("s")
+            for linea in f:
+                campos = linea.split()
+                if len(campos) < len(columnas):
+                    continue
+                sexo = _SEXOS[campos[i_sexo]]
+                tabla = tablas.setdefault((indicador, sexo), TablaLMS())
+                tabla.agregar(float(campos[i_edad]), float(campos[i_l]),
+                              float(campos[i_m]), float(campos[i_s]))
+        for tabla in tablas.values():
+            tabla.ordenar()
+        return tablas
+
+    def tabla(self, indicador, sexo):
+        if self._tablas is None:
+            self._cargar()
+        return self._tablas.get((indicador, _SEXOS.get(sexo, sexo)))
+
+    def disponible(self, indicador, sexo="M"):
+        return self.tabla(indicador, sexo) is not None
+
+    def zscore(self, indicador, sexo, edad_dias, valor):
+        """Puntaje z de `valor`, o None si no hay tabla para el indicador y sexo"""
+        tabla = self.tabla(indicador, sexo)
+        if tabla is None or valor is None or valor <= 0:
+            return None
+        l, m, s = tabla.lms(edad_dias)
+        return _z_lms(valor, l, m, s, indicador in _AJUSTE_EXTREMOS)
+
+    def puntuar(self, indicador, sexos, edades_dias, valores):
+        """Puntajes z de un lote completo (listas paralelas); None donde no se puede calcular.
+
+        Con numpy se interpola y se calcula cada sexo en una sola operación
+        vectorizada; sin numpy, se recorre el lote con `zscore`.
+        """
+        n = len(valores)
+        np = importar("numpy")
+        if np is None:
+            return [self.zscore(indicador, sexos[i], edades_dias[i], valores[i]) for i in range(n)]
+        sexos = np.asarray([_SEXOS.get(str(x), "") for x in sexos])
+        edades = np.asarray(edades_dias, dtype=float)
+        x = np.asarray([np.nan if v is None else v for v in valores], dtype=float)
+        z = np.full(n, np.nan)
+        for sexo in ("M", "F"):
+            tabla = self.tabla(indicador, sexo)
+            sel = (sexos == sexo) & (x > 0)
+            if tabla is None or not sel.any():
+                continue
+            z[sel] = self._z_vector(tabla, edades[sel], x[sel], indicador in _AJUSTE_EXTREMOS)
+        return [None if math.isnan(v) else float(v) for v in z]
+
+    @staticmethod
+    def _z_vector(tabla, edades, x, ajustar):
+        np = importar("numpy")
+        tabla_edades = np.frombuffer(tabla.edades, dtype=float)
+        l = np.interp(edades, tabla_edades, np.frombuffer(tabla.l, dtype=float))
+        m = np.interp(edades, tabla_edades, np.frombuffer(tabla.m, dtype=float))
+        s = np.interp(edades, tabla_edades, np.frombuffer(tabla.s, dtype=float))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = np.where(l == 0, np.log(x / m) / s, ((x / m) ** l - 1.0) / (l * s))
+            if ajustar:
+                def sd(k):
+                    return np.where(l == 0, m * np.exp(s * k), m * (1.0 + l * s * k) ** (1.0 / l))
+                altos, bajos = z > 3, z < -3
+                z = np.where(altos, 3.0 + (x - sd(3)) / (sd(3) - sd(2)), z)
+                z = np.where(bajos, -3.0 + (x - sd(-3)) / (sd(-2) - sd(-3)), z)
+        return z
+
+    def percentiles(self, zs):
+        return [None if z is None else percentil(z) for z in zs]
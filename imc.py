@@ -0,0 +1,314 @@
+# imc.py - LactaSegura - Cálculo e interpretación del IMC, sin interfaz
+# Sin dependencias de Kivy: lo usa CalculadoraIMC y también se puede ejecutar
+# como programa para puntuar archivos completos:
+#   python imc.py lactasegura_imc_history.json puntuado.csv --procesos 4
+import os, re, io, sys, csv, json, argparse
+from itertools import chain, islice
+from growth import MotorCrecimiento, clasificar_imc_z, meses_a_dias, percentil
+
+# Rangos aceptados: bebés y niños de 0 a 36 meses
+RANGOS = {
+    "peso": (0.5, 30, "El peso debe estar entre 0.5 y 30 kg"),
+    "talla": (30, 120, "La talla debe estar entre 30 y 120 cm"),
+    "edad": (0, 36, "La edad debe estar entre 0 y 36 meses"),
+}
+
+# Código de clasificación -> (estado, recomendación, color)
+TEXTOS = {
+    "bajo_severo": ("ATENCIÓN: Posible bajo peso severo",
+                    "Consulte URGENTEMENTE a un profesional de la salud.", "ff0000"),
+    "bajo": ("Alerta: Bajo peso",
+             "Se recomienda consultar a un pediatra para evaluación.", "ffa500"),
+    "normal": ("IMC dentro de rangos esperados para la edad",
+               "Continúe con los controles regulares.", "008000"),
+    "riesgo_sobrepeso": ("Posible riesgo de sobrepeso",
+                         "Consulte con su pediatra en el próximo control.", "ffa500"),
+    "sobrepeso": ("IMC por encima del rango esperado",
+                  "Consulte con su pediatra en el próximo control.", "ffa500"),
+    "obesidad": ("IMC muy por encima del rango esperado",
+                 "Consulte a un profesional de la salud.", "ff0000"),
+}
+
+AVISO = ("Recordatorio: Este cálculo es solo orientativo.\n"
+         "Siempre siga las recomendaciones de su profesional de salud.")
+
+# Nombres de columna aceptados en la entrada (historial, registros o CSV)
+_CAMPOS = {
+    "peso": ("peso_kg", "peso", "weight"),
+    "talla": ("talla_cm", "talla", "length", "height"),
+    "edad": ("edad_meses", "edad", "age_months"),
+    "sexo": ("sexo", "sex"),
+}
+
+
+def numero(valor):
+    """float de un texto con coma o punto decimal; None si no es un número"""
+    if valor is None or valor == "":
+        return None
+    try:
+        return float(str(valor).replace(",", "."))
+    except ValueError:
+        return None
+
+
+def validar(peso, talla, edad):
+    """Mensaje de error del primer valor fuera de rango, o None"""
+    for nombre, valor in (("peso", peso), ("talla", talla), ("edad", edad)):
+        minimo, maximo, mensaje = RANGOS[nombre]
+        if valor is None or not (minimo <= valor <= maximo):
+            return mensaje
+    return None
+
+
+def calcular_imc(peso_kg, talla_cm):
+    talla_m = talla_cm / 100.0
+    return peso_kg / (talla_m ** 2)
+
+
+def clasificar_por_cortes(imc, edad_meses):
+    """Clasificación con los puntos de corte fijos por edad (sin sexo o sin tablas OMS)"""
+    if edad_meses <= 24:
+        rango_bajo, rango_normal, rango_alto = 13, 14, 17
+    else:
+        rango_bajo, rango_normal, rango_alto = 14, 15, 18
+    if imc < rango_bajo:
+        return "bajo_severo"
+    if imc < rango_normal:
+        return "bajo"
+    if imc < rango_alto:
+        return "normal"
+    return "sobrepeso"
+
+
+def evaluar(peso, talla, edad_meses, sexo="", motor=None):
+    """IMC y clasificación de una medición ya validada.
+
+    Devuelve {"imc", "codigo", "z", "percentil", "metodo"}; `metodo` es "oms"
+    si hubo sexo y tablas para el puntaje z, o "cortes" en caso contrario.
+    """
+    imc = calcular_imc(peso, talla)
+    z = None
+    if sexo and motor is not None:
+        z = motor.zscore("imc", sexo, meses_a_dias(edad_meses), imc)
+    if z is None:
+        return {"imc": imc, "codigo": clasificar_por_cortes(imc, edad_meses),
+                "z": None, "percentil": None, "metodo": "cortes"}
+    return {"imc": imc, "codigo": clasificar_imc_z(z), "z": z,
+            "percentil": percentil(z), "metodo": "oms"}
+
+
+def interpretacion(codigo, imc, peso, talla, edad_meses, z=None, pct=None):
+    """Texto (markup de Kivy) de una clasificación; se arma al mostrarlo, no se guarda"""
+    estado, recomendacion, color = TEXTOS[codigo]
+    detalle = ""
+    if z is not None:
+        detalle = f"Puntaje z (OMS): {z:+.2f} - percentil {pct:.0f}\n"
+    return (f"[color={color}]{estado}[/color]\n\n[b]{recomendacion}[/b]\n\n"
+            f"IMC calculado: {imc:.1f}\n{detalle}Peso: {peso:.1f} kg\nTalla: {talla:.1f} cm\n"
+            f"Edad: {int(edad_meses)} meses\n\n[i]{AVISO}[/i]")
+
+
+def codigo_de_texto(texto):
+    """Código de una interpretación guardada como texto (historial anterior), o None"""
+    for codigo, (estado, _, _) in TEXTOS.items():
+        if estado in texto:
+            return codigo
+    return None
+
+
+def migrar_entrada(calculo):
+    """Entrada de historial en el formato compacto: valores y código, sin el texto.
+
+    Las entradas anteriores guardaban la interpretación completa; el código
+    se recupera del texto y, si no se reconoce, se recalcula con los cortes.
+    """
+    if "interpretacion" not in calculo:
+        return calculo
+    entrada = dict(calculo)
+    texto = entrada.pop("interpretacion") or ""
+    if not entrada.get("codigo"):
+        codigo = codigo_de_texto(texto)
+        if codigo is None:
+            peso, talla, edad = (numero(_campo(entrada, c)) for c in ("peso", "talla", "edad"))
+            if not validar(peso, talla, edad):
+                codigo = clasificar_por_cortes(calcular_imc(peso, talla), edad)
+        entrada["codigo"] = codigo or ""
+    return entrada
+
+
+def _campo(fila, nombre):
+    for clave in _CAMPOS[nombre]:
+        if clave in fila:
+            return fila[clave]
+    return None
+
+
+def evaluar_lote(filas, motor=None, sexo_defecto=""):
+    """Puntúa una lista de filas (dicts) y devuelve copias con las columnas de resultado.
+
+    Los puntajes z de IMC y de peso para la edad se calculan con una sola
+    llamada por lote a `MotorCrecimiento.puntuar`. Las filas sin talla (p. ej.
+    los registros locales) sólo reciben el puntaje de peso.
+    """
+    salida = []
+    sexos, edades, imcs, pesos = [], [], [], []
+    for fila in filas:
+        peso, talla, edad = numero(_campo(fila, "peso")), numero(_campo(fila, "talla")), numero(_campo(fila, "edad"))
+        sexo = str(_campo(fila, "sexo") or sexo_defecto).strip().upper()[:1]
+        resultado = dict(fila)
+        imc = None
+        if peso is not None and talla is not None and edad is not None and not validar(peso, talla, edad):
+            imc = calcular_imc(peso, talla)
+            resultado.update(imc=round(imc, 2), clasificacion=clasificar_por_cortes(imc, edad), metodo="cortes")
+        else:
+            resultado.update(imc=None, clasificacion=None, metodo=None)
+        resultado.update(z_imc=None, percentil_imc=None, z_peso=None)
+        salida.append(resultado)
+        sexos.append(sexo)
+        edades.append(meses_a_dias(edad) if edad is not None else 0.0)
+        imcs.append(imc)
+        pesos.append(peso if edad is not None else None)
+    if motor is not None and any(sexos):
+        for resultado, z in zip(salida, motor.puntuar("imc", sexos, edades, imcs)):
+            if z is not None:
+                resultado.update(z_imc=round(z, 3), percentil_imc=round(percentil(z), 1),
+                                 clasificacion=clasificar_imc_z(z), metodo="oms")
+        for resultado, z in zip(salida, motor.puntuar("peso", sexos, edades, pesos)):
+            if z is not None:
+                resultado["z_peso"] = round(z, 3)
+    return salida
+
+
+# --- Lectura y escritura en flujo ---
+_SEPARADORES = re.compile(r"[\s,]*")
+COLUMNAS_RESULTADO = ["imc", "clasificacion", "metodo", "z_imc", "percentil_imc", "z_peso"]
+
+
+def _leer_arreglo_json(f, tam_bloque=1 << 16):
+    """Elementos de un arreglo JSON de nivel superior, sin cargar el archivo completo"""
+    decodificador = json.JSONDecoder()
+    buf = f.read(tam_bloque).lstrip()
+    if not buf.startswith("["):
+        raise ValueError("Se esperaba un arreglo JSON")
+    pos = 1
+    fin = False
+    while True:
+        pos = _SEPARADORES.match(buf, pos).end()
+        if buf.startswith("]", pos):
+            return
+        try:
+            item, pos_siguiente = decodificador.raw_decode(buf, pos)
+        except ValueError:
+            # Elemento cortado al final del bloque: se lee el siguiente y se reintenta
+            if fin:
+                raise
+            mas = f.read(tam_bloque)
+            fin = not mas
+            buf = buf[pos:] + mas
+            pos = 0
+            continue
+        yield item
+        pos = pos_siguiente
+
+
+def leer_filas(path):
+    """Filas de un historial/registros JSON (arreglo), JSON Lines o CSV, de a una"""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if extension == ".csv":
+            yield from csv.DictReader(f)
+        elif extension == ".jsonl":
+            for linea in f:
+                linea = linea.strip()
+                if linea:
+                    fila = json.loads(linea)
+                    if "_borrado" not in fila:
+                        yield fila
+        else:
+            yield from _leer_arreglo_json(f)
+
+
+def _bloques(filas, tam):
+    filas = iter(filas)
+    while True:
+        bloque = list(islice(filas, tam))
+        if not bloque:
+            return
+        yield bloque
+
+
+def formatear(filas, formato, columnas):
+    """Texto CSV (sin encabezado) o JSON Lines de las filas puntuadas"""
+    if formato == "csv":
+        salida = io.StringIO()
+        csv.DictWriter(salida, fieldnames=columnas, extrasaction="ignore").writerows(filas)
+        return salida.getvalue()
+    return "".join(json.dumps(fila, ensure_ascii=False) + "\n" for fila in filas)
+
+
+_motor_proceso = None
+
+
+def _iniciar_proceso(directorio):
+    global _motor_proceso
+    _motor_proceso = MotorCrecimiento(directorio)
+
+
+def _procesar_bloque(args):
+    # Puntuar y formatear en el mismo proceso: al principal sólo vuelve texto
+    bloque, sexo, formato, columnas = args
+    return formatear(evaluar_lote(bloque, _motor_proceso, sexo), formato, columnas), len(bloque)
+
+
+def puntuar_archivo(entrada, salida=None, sexo="", tablas="who_growth", procesos=1, tam_bloque=2000):
+    """Puntúa `entrada` en flujo y escribe el resultado; devuelve la cantidad de filas"""
+    formato = "csv" if salida and salida.lower().endswith(".csv") else "jsonl"
+    bloques = _bloques(leer_filas(entrada), tam_bloque)
+    primero = next(bloques, None)
+    if primero is None:
+        return 0
+    # Columnas de la salida CSV: las de la primera fila más las de resultado
+    columnas = list(primero[0]) + [c for c in COLUMNAS_RESULTADO if c not in primero[0]]
+    trabajos = ((bloque, sexo, formato, columnas) for bloque in chain([primero], bloques))
+    f_salida = open(salida, "w", encoding="utf-8", newline="") if salida else sys.stdout
+    total = 0
+    try:
+        if formato == "csv":
+            csv.writer(f_salida).writerow(columnas)
+        if procesos > 1:
+            import multiprocessing
+            with multiprocessing.Pool(procesos, initializer=_iniciar_proceso, initargs=(tablas,)) as pool:
+                # imap conserva el orden de entrada y mantiene pocos bloques en memoria
+                resultados = pool.imap(_procesar_bloque, trabajos)
+                for texto, n in resultados:
+                    f_salida.write(texto)
+                    total += n
+        else:
+            _iniciar_proceso(tablas)
+            for trabajo in trabajos:
+                texto, n = _procesar_bloque(trabajo)
+                f_salida.write(texto)
+                total += n
+    finally:
+        if salida:
+            f_salida.close()
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Puntúa mediciones de IMC sin la interfaz de LactaSegura")
+    parser.add_argument("entrada", help="historial/registros .json, .jsonl o .csv")
+    parser.add_argument("salida", nargs="?", help=".csv o .jsonl (por defecto, JSON Lines por la salida estándar)")
+    parser.add_argument("--sexo", default="", help="M o F para las filas sin columna de sexo")
+    parser.add_argument("--tablas", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "who_growth"),
+                        help="carpeta con las tablas LMS de la OMS")
+    parser.add_argument("--procesos", type=int, default=1, help="procesos en paralelo")
+    parser.add_argument("--bloque", type=int, default=2000, help="filas por bloque")
+    args = parser.parse_args(argv)
+    total = puntuar_archivo(args.entrada, args.salida, args.sexo, args.tablas, args.procesos, args.bloque)
+    print(f"{total} filas puntuadas", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
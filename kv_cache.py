@@ -0,0 +1,98 @@
+# kv_cache.py - LactaSegura - Carga de las reglas KV desde un caché preprocesado
+# El parseo y la compilación de las expresiones de lactasegura.kv se hacen una
+# sola vez; los arranques siguientes cargan el resultado ya procesado (pickle,
+# con los objetos de código serializados con marshal) si el hash coincide.
+import os, sys, hashlib, pickle, copyreg, marshal, types
+from functools import partial
+import kivy
+from kivy.lang import Builder
+from kivy.lang.parser import Parser
+from kivy.factory import Factory
+
+
+def _reducir_codigo(co):
+    return marshal.loads, (marshal.dumps(co),)
+
+
+class _Pickler(pickle.Pickler):
+    # Las reglas guardan las expresiones compiladas (code objects), que pickle no serializa solo
+    dispatch_table = copyreg.dispatch_table.copy()
+    dispatch_table[types.CodeType] = _reducir_codigo
+
+
+def clave_kv(contenido):
+    """Hash del contenido del .kv; incluye las versiones de Kivy y Python (marshal no es portable)"""
+    h = hashlib.sha1(contenido)
+    h.update(f"|{kivy.__version__}|{sys.version}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _leer_cache(cache_path, clave):
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, "rb") as f:
+            datos = pickle.load(f)
+        if not isinstance(datos, dict) or datos.get("clave") != clave:
+            return None
+        parser = datos["parser"]
+        # Las directivas (#:import, #:set) modifican el estado global de Kivy: se repiten
+        parser.execute_directives()
+        return parser
+    except Exception as e:
+        print("Caché KV inválido, se usa el archivo fuente:", e)
+        return None
+
+
+def _escribir_cache(cache_path, clave, parser):
+    tmp = cache_path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            _Pickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump({"clave": clave, "parser": parser})
+        os.replace(tmp, cache_path)
+    except Exception as e:
+        print("No se pudo guardar el caché KV:", e)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _registrar(parser, filename):
+    """Lo que hace Builder.load_string con un archivo sin regla raíz, una vez parseado"""
+    Builder.rules.extend(parser.rules)
+    Builder._clear_matchcache()
+    for name, cls, template in getattr(parser, "templates", ()):
+        Builder.templates[name] = (cls, template, filename)
+        Factory.register(name, cls=partial(Builder.template, name), is_template=True, warn=True)
+    for name, baseclasses in parser.dynamic_classes.items():
+        Factory.register(name, baseclasses=baseclasses, filename=filename, warn=True)
+    if parser.rules or parser.dynamic_classes:
+        Builder.files.append(filename)
+
+
+def cargar_kv(path, cache_path):
+    """Carga las reglas de `path` y devuelve de dónde salieron: 'cache', 'fuente' o 'builder'.
+
+    'builder' es la ruta de respaldo de siempre (Builder.load_file), usada si
+    el archivo tiene una regla raíz o si algo falla antes de registrar reglas.
+    """
+    with open(path, "rb") as f:
+        contenido = f.read()
+    clave = clave_kv(contenido)
+    origen = "cache"
+    parser = _leer_cache(cache_path, clave)
+    if parser is None:
+        origen = "fuente"
+        try:
+            parser = Parser(content=contenido.decode("utf-8"), filename=path)
+        except Exception as e:
+            print("Error preprocesando KV, se usa Builder:", e)
+            Builder.load_file(path)
+            return "builder"
+    if parser.root is not None:
+        # Con regla raíz Builder también crea el widget: no vale la pena el caché
+        Builder.load_file(path)
+        return "builder"
+    if origen == "fuente":
+        _escribir_cache(cache_path, clave, parser)
+    _registrar(parser, path)
+    return origen
@@ -1,47 +1,36 @@
-
 # main.py - LactaSegura (Kivy) - Online-capable version
 # Requires: kivy, requests (optional for online features), kivy_garden.graph, plyer
-import webbrowser, os, json, threading, socket
+# requests, kivy_garden.graph, plyer and webbrowser are imported on first use
+# (startup.importar) so they do not delay the first frame.
+from startup import arranque, importar
+import os, json, threading
 from datetime import datetime, timedelta
 import kivy
 kivy.require('2.3.0')
 
-try:
-    from kivy_garden.graph import Graph, MeshLinePlot, SmoothLinePlot
-except ImportError as e:
-    print(f"Error importando gráficos: {e}")
-    class Graph:
-        def __init__(self, **kwargs): pass
-    class MeshLinePlot: pass
-    class SmoothLinePlot: pass
-
 from kivy.utils import get_color_from_hex
-try:
-    from plyer import notification
-except ImportError:
-    # Fallback para cuando plyer no está disponible
-    class notification:
-        @staticmethod
-        def notify(title="", message="", app_icon=None, timeout=10):
-            print(f"Notificación: {title} - {message}")
 from functools import partial
-try:
-    import requests
-    _HAS_REQUESTS = True
-except Exception:
-    requests = None
-    _HAS_REQUESTS = False
 from kivy.app import App
 from kivy.lang import Builder
 from kivy.uix.screenmanager import ScreenManager, Screen, SlideTransition
-from kivy.properties import StringProperty, ListProperty, BooleanProperty
-from kivy.clock import mainthread
+from kivy.properties import StringProperty, ListProperty, BooleanProperty, NumericProperty
+from kivy.clock import Clock, mainthread
 from kivy.uix.button import Button
 from kivy.uix.label import Label
-from kivy.uix.textinput import TextInput
-from kivy.uix.boxlayout import BoxLayout
-from kivy.graphics import Color, Rectangle
-from kivy.metrics import dp
+from storage import BaseDatos, CacheDatos, GuardadoDiferido, importar_json
+from connectivity import MonitorConexion
+from record_index import IndiceRegistros
+from models import Registro, formatear_numero
+from articles import CacheHttp, CatalogoArticulos, normalizar_pagina
+from sync import TrabajadorSync, TransporteHttp, TransporteLocal, comprimir_lote, dividir_en_lotes
+from search_index import IndiceBusqueda
+from kv_cache import cargar_kv
+from growth import MotorCrecimiento
+import imc as imc_motor
+from charts import SerieGrafico
+from columns import ColumnasEnMemoria
+from export import FORMATOS, TrabajoExportacion
+arranque.marcar("imports")
 
 # --- Article metadata (include trustworthy references and DOIs) ---
 ARTICLES = [
@@ -70,20 +59,15 @@ class MainMenu(Screen):
     online = BooleanProperty(False)
     sync_status = StringProperty("")
     
-    def on_enter(self):
-        # Verificar estado de conexión al entrar
-        self.check_connection()
-        # Programar verificación periódica
-        from kivy.clock import Clock
-        Clock.schedule_interval(lambda dt: self.check_connection(), 30)  # cada 30 segundos
-        
-    def on_leave(self):
-        from kivy.clock import Clock
-        Clock.unschedule(self.check_connection)
-    
+    # La verificación periódica (cada 30 s) la registra la app en `app.tareas`,
+    # ligada a la entrada y salida de esta pantalla.
     def check_connection(self, *args):
+        # Sólo lee el estado en caché; el monitor comprueba la red en segundo plano
         app = App.get_running_app()
-        self.online = app.is_online()
+        self.set_connection(app.is_online())
+
+    def set_connection(self, online):
+        self.online = online
         if self.online:
             self.sync_status = "En línea"
         else:
@@ -92,7 +76,7 @@ class MainMenu(Screen):
     # Métodos accesibles desde KV para navegar desde el menú
     def abrir_pantalla(self, name):
         try:
-            App.get_running_app().root.current = name
+            App.get_running_app().abrir_pantalla(name)
         except Exception as e:
             print(f"No se pudo cambiar a la pantalla {name}: {e}")
 
@@ -111,198 +95,313 @@ class MainMenu(Screen):
     def abrir_registro(self):
         self.abrir_pantalla('registro')
 
+    def abrir_historial(self):
+        self.abrir_pantalla('historial')
+
     def abrir_acerca(self):
         self.abrir_pantalla('acerca')
 
+# --- Guide texts (shown by the guide screens and indexed by the offline search) ---
+GUIAS = {
+    "madres": (
+        "Guía para madres",
+        "Lactancia materna exclusiva:\nBeneficios: protección inmunológica, mejor nutrición, vínculo madre-hijo.\n\nTécnica: posición cómoda, boca bien abierta, labio inferior evertido.\n\nReconocer la desnutrición:\nSignos: pérdida de peso, letargo, piel seca.\n\nEmergencias: si no puedes amamantar, busca apoyo profesional y evita el uso de fórmula sin supervisión.\n\nLactancia cruzada: sólo con evaluación profesional y consentimiento."
+    ),
+    "enfermeros": (
+        "Guía para enfermeros",
+        "Valoración nutricional:\n- Peso, talla, registro en curvas.\nIntervención y educación:\n- Consejería en lactancia, acompañamiento psicoemocional.\nProtocolos en emergencias:\n- Identificar lactantes vulnerables; facilitar lactancia cruzada segura; articular con equipos humanitarios."
+    ),
+}
+
 class GuiaMadres(Screen):
-    pass
+    texto = StringProperty(GUIAS["madres"][1])
 
 class GuiaEnfermeros(Screen):
-    pass
+    texto = StringProperty(GUIAS["enfermeros"][1])
+
+class ArticuloItem(Button):
+    """Botón reciclable de la lista de artículos; `indice` apunta a app.articles
+    y `destino`, si no está vacío, a la pantalla de una guía (resultados de búsqueda)"""
+    indice = NumericProperty(0)
+    destino = StringProperty("")
 
 class Articulos(Screen):
     articles = ListProperty(ARTICLES)
+    consulta = StringProperty("")
     
     def on_enter(self):
         self.populate_articles()
         
     def populate_articles(self):
-        grid = self.ids.art_grid
-        grid.clear_widgets()
-        for article in self.articles:
-            btn = Button(
-                text=article["title"],
-                size_hint_y=None,
-                height='48dp',
-                background_normal="",
-                background_color=(1, 0.78, 0.82, 1)
-            )
-            btn.bind(on_release=lambda btn, art=article: 
-                App.get_running_app().abrir_resumen(
-                    art["title"],
-                    f"{art['authors']}\n\nFuente: {art['source']}\n\n{art['summary']}",
-                    art["url"]
-                )
-            )
-            grid.add_widget(btn)
+        if self.consulta:
+            self.buscar(self.consulta)
+            return
+        # Sólo títulos: el resumen se carga al abrir cada artículo
+        self.ids.art_rv.data = [
+            {"text": article.get("title", ""), "indice": i, "destino": ""}
+            for i, article in enumerate(self.articles)
+        ]
+        self._completar_pantalla()
+
+    def agregar_articulos(self, nuevos):
+        inicio = len(self.articles)
+        self.articles.extend(nuevos)
+        if self.consulta:
+            return
+        self.ids.art_rv.data.extend(
+            {"text": article.get("title", ""), "indice": inicio + i, "destino": ""}
+            for i, article in enumerate(nuevos)
+        )
+        self._completar_pantalla()
+
+    def _completar_pantalla(self):
+        # Si la lista no llena la pantalla no hay desplazamiento que pida la página
+        # siguiente: se pide en cuanto la lista se acomoda, hasta llenarla o agotar el catálogo
+        Clock.schedule_once(self._pedir_si_falta, 0)
+
+    def _pedir_si_falta(self, *args):
+        rv = self.ids.art_rv
+        if not self.consulta and rv.children and rv.children[0].height < rv.height:
+            App.get_running_app().cargar_mas_articulos()
+
+    def buscar(self, texto):
+        # Búsqueda sin conexión sobre artículos y guías (índice BM25 de la app)
+        self.consulta = texto.strip()
+        if not self.consulta:
+            self.populate_articles()
+            return
+        self.ids.art_rv.data = App.get_running_app().buscar(self.consulta)
+        self.ids.art_rv.scroll_y = 1
+
+    def al_desplazar(self, scroll_y):
+        # Cerca del final de la lista se pide la página siguiente del catálogo
+        if scroll_y < 0.1 and not self.consulta:
+            App.get_running_app().cargar_mas_articulos()
 
 class ResumenArticulo(Screen):
     title = StringProperty("")
     content = StringProperty("")
     content_link = StringProperty("")
 
+class HistorialItem(Label):
+    """Fila reciclable del historial IMC (ver <HistorialItem> en el KV)"""
+    fecha = StringProperty("")
+    peso_kg = StringProperty("")
+    talla_cm = StringProperty("")
+    edad_meses = StringProperty("")
+    imc = StringProperty("")
+    codigo = StringProperty("")
+
+    @staticmethod
+    def formatear(fecha, peso_kg, talla_cm, edad_meses, imc, codigo=""):
+        return (f"Fecha: {fecha}\n"
+                f"Peso: {peso_kg} kg, "
+                f"Talla: {talla_cm} cm, "
+                f"Edad: {edad_meses} meses\n"
+                f"IMC: {imc}"
+                + (f" - {imc_motor.TEXTOS[codigo][0]}" if codigo in imc_motor.TEXTOS else ""))
+
+def _id_de_opcion(texto):
+    """Id del registro de una opción "Nombre (#id)" de la lista de bebés; "" si no tiene"""
+    if texto.endswith(")") and "(#" in texto:
+        return texto[texto.rindex("(#") + 2:-1]
+    return ""
+
 class HistorialIMC(Screen):
+    exportando = BooleanProperty(False)
+    # Bebé cuyo historial se muestra ("" = todas las mediciones)
+    registro_id = StringProperty("")
+    bebes = ListProperty([])
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Series en caché: al volver a la pantalla sólo se agregan las mediciones nuevas
+        self.serie_imc = SerieGrafico()
+        self.serie_peso = SerieGrafico()
+        self._graficos = None
+        self.exportacion = None
+        self._leidos = 0
+        self._serie = None
+        self._respaldo = None
+        self._historial_rv = None
+
     def on_enter(self):
+        self.bebes = App.get_running_app().opciones_bebes("Todos los bebés")
         self.cargar_historial()
         self.actualizar_graficos()
-        
+
+    def seleccionar_bebe(self, texto):
+        self.registro_id = _id_de_opcion(texto)
+
+    def on_registro_id(self, instance, value):
+        self.cargar_historial()
+        self.actualizar_graficos()
+
+    def _historial(self):
+        datos = App.get_running_app().datos
+        # Un solo bebé: se lee por índice sólo su curva, no todo el historial
+        return datos.historial_de(self.registro_id) if self.registro_id else datos.historial()
+
+    def _columnas(self):
+        """Columnas numéricas del historial: el archivo mapeado o, sin él, la lista en memoria"""
+        app = App.get_running_app()
+        if not self.registro_id:
+            lector = app.db.historial.abrir_columnas()
+            if lector is not None:
+                return lector
+        historial = self._historial()
+        if self._respaldo is None or self._respaldo[0] is not historial:
+            self._respaldo = (historial, ColumnasEnMemoria(historial))
+        return self._respaldo[1]
+
+    def _actualizar_series(self, columnas):
+        """Agrega a las series las mediciones nuevas; devuelve True si algo cambió"""
+        n = self._leidos
+        if columnas.serie != self._serie or n > columnas.filas:
+            # El historial cambió en el medio (borrado, restauración): se reconstruye
+            self.serie_imc.limpiar()
+            self.serie_peso.limpiar()
+            n = 0
+        nuevos_imc = []
+        nuevos_peso = []
+        # Sólo las filas nuevas; las columnas mapeadas no se copian ni se parsean
+        valores = zip(*(columnas.columna(c)[n:] for c in ("imc", "peso_kg", "edad_meses")))
+        for i, (imc, peso, edad) in enumerate(valores, n):
+            if imc != imc or peso != peso or edad != edad:  # NaN: falta el valor
+                continue
+            nuevos_imc.append((i, imc))
+            nuevos_peso.append((edad, peso))
+        self.serie_imc.agregar(nuevos_imc)
+        self.serie_peso.agregar(nuevos_peso)
+        self._leidos = columnas.filas
+        self._serie = columnas.serie
+        return n == 0 or bool(nuevos_imc)
+
+    def _crear_graficos(self, graph):
+        # Gráfico de IMC vs tiempo y de peso vs edad; los ejes se ajustan a los datos
+        graph_imc = graph.Graph(
+            xlabel='Fecha',
+            ylabel='IMC',
+            x_ticks_minor=5,
+            x_ticks_major=10,
+            y_ticks_major=1,
+            y_grid=True,
+            x_grid=True,
+            padding=5,
+            x_grid_label=True,
+            y_grid_label=True,
+            xmin=0,
+            xmax=10,
+            ymin=10,
+            ymax=20
+        )
+        graph_peso = graph.Graph(
+            xlabel='Edad (meses)',
+            ylabel='Peso (kg)',
+            x_ticks_minor=1,
+            x_ticks_major=6,
+            y_ticks_major=2,
+            y_grid=True,
+            x_grid=True,
+            padding=5,
+            x_grid_label=True,
+            y_grid_label=True,
+            xmin=0,
+            xmax=36,
+            ymin=0,
+            ymax=20
+        )
+        plot_imc = graph.SmoothLinePlot(color=get_color_from_hex('#FF5722'))
+        plot_peso = graph.SmoothLinePlot(color=get_color_from_hex('#2196F3'))
+        graph_imc.add_plot(plot_imc)
+        graph_peso.add_plot(plot_peso)
+        graficos_layout = self.ids.graficos_layout
+        graficos_layout.clear_widgets()
+        graficos_layout.add_widget(graph_imc)
+        graficos_layout.add_widget(graph_peso)
+        self._graficos = ((graph_imc, plot_imc, self.serie_imc), (graph_peso, plot_peso, self.serie_peso))
+
     def actualizar_graficos(self):
+        graph = importar("kivy_garden.graph")
+        if graph is None:
+            return
         try:
-            # Crear gráfico de IMC vs tiempo
-            graph_imc = Graph(
-                xlabel='Fecha',
-                ylabel='IMC',
-                x_ticks_minor=5,
-                x_ticks_major=10,
-                y_ticks_major=1,
-                y_grid=True,
-                x_grid=True,
-                padding=5,
-                x_grid_label=True,
-                y_grid_label=True,
-                xmin=0,
-                xmax=10,
-                ymin=10,
-                ymax=20
-            )
-            
-            # Crear gráfico de peso vs edad
-            graph_peso = Graph(
-                xlabel='Edad (meses)',
-                ylabel='Peso (kg)',
-                x_ticks_minor=1,
-                x_ticks_major=6,
-                y_ticks_major=2,
-                y_grid=True,
-                x_grid=True,
-                padding=5,
-                x_grid_label=True,
-                y_grid_label=True,
-                xmin=0,
-                xmax=36,
-                ymin=0,
-                ymax=20
-            )
-            
-            # Cargar datos históricos
-            if os.path.exists(CalculadoraIMC.imc_history_file):
-                with open(CalculadoraIMC.imc_history_file, "r", encoding="utf-8") as f:
-                    historial = json.load(f)
-                    
-                # Preparar datos para los gráficos
-                plot_imc = SmoothLinePlot(color=get_color_from_hex('#FF5722'))
-                plot_peso = SmoothLinePlot(color=get_color_from_hex('#2196F3'))
-                
-                puntos_imc = []
-                puntos_peso = []
-                
-                for i, calculo in enumerate(historial):
-                    imc = float(calculo['imc'])
-                    peso = float(calculo['peso_kg'])
-                    edad = float(calculo['edad_meses'])
-                    
-                    puntos_imc.append((i, imc))
-                    puntos_peso.append((edad, peso))
-                
-                plot_imc.points = puntos_imc
-                plot_peso.points = puntos_peso
-                
-                # Añadir plots a los gráficos
-                graph_imc.add_plot(plot_imc)
-                graph_peso.add_plot(plot_peso)
-                
-                # Añadir gráficos al layout
-                graficos_layout = self.ids.graficos_layout
-                graficos_layout.clear_widgets()
-                graficos_layout.add_widget(graph_imc)
-                graficos_layout.add_widget(graph_peso)
-                
+            columnas = self._columnas()
+            try:
+                cambio = self._actualizar_series(columnas)
+            finally:
+                columnas.cerrar()
+            if self._graficos is None:
+                self._crear_graficos(graph)
+                cambio = True
+            if not cambio:
+                return
+            # Como mucho un punto por píxel de ancho: el costo de dibujar no crece con el historial
+            umbral = max(200, int(self.ids.graficos_layout.width))
+            for grafico, plot, serie in self._graficos:
+                if not serie:
+                    plot.points = []
+                    continue
+                plot.points = serie.reducida(umbral)
+                grafico.xmin, grafico.xmax, grafico.x_ticks_major = serie.ejes_x()
+                grafico.ymin, grafico.ymax, grafico.y_ticks_major = serie.ejes_y()
         except Exception as e:
             print(f"Error al actualizar gráficos: {e}")
         
     def cargar_historial(self):
         try:
-            grid = self.ids.historial_grid
-            grid.clear_widgets()
-            if os.path.exists(CalculadoraIMC.imc_history_file):
-                with open(CalculadoraIMC.imc_history_file, "r", encoding="utf-8") as f:
-                    historial = json.load(f)
-                    
-                for calculo in reversed(historial):  # Mostrar más recientes primero
-                    from datetime import datetime
-                    fecha = datetime.fromisoformat(calculo["fecha"]).strftime("%d/%m/%Y %H:%M")
-                    texto = (f"Fecha: {fecha}\n"
-                            f"Peso: {calculo['peso_kg']} kg, "
-                            f"Talla: {calculo['talla_cm']} cm, "
-                            f"Edad: {calculo['edad_meses']} meses\n"
-                            f"IMC: {calculo['imc']}")
-                    
-                    item = BoxLayout(orientation='vertical', 
-                                   size_hint_y=None, 
-                                   height='100dp',
-                                   padding=['10dp', '5dp'],
-                                   spacing='5dp')
-                    
-                    item.canvas.before.add(Color(0.95, 0.95, 0.95, 1))
-                    item.canvas.before.add(Rectangle(pos=item.pos, size=item.size))
-                    
-                    lbl = Label(text=texto,
-                              color=(0, 0, 0, 1),
-                              text_size=(grid.width - dp(20), None),
-                              size_hint_y=None,
-                              height='100dp')
-                    item.add_widget(lbl)
-                    grid.add_widget(item)
-                    
-                    def _update_text_size(lbl, width):
-                        lbl.text_size = (width - dp(20), None)
-                    
-                    grid.bind(width=lambda inst, val: _update_text_size(lbl, val))
+            historial = self._historial()
+            if historial is self._historial_rv:
+                return  # Sin cambios desde la última entrada: las filas ya están armadas
+            # Sólo datos livianos: el RecycleView instancia y formatea las filas visibles
+            self.ids.historial_rv.data = [
+                {
+                    "fecha": medicion.fecha_corta(),
+                    "peso_kg": formatear_numero(medicion.peso_kg),
+                    "talla_cm": formatear_numero(medicion.talla_cm),
+                    "edad_meses": formatear_numero(medicion.edad_meses),
+                    "imc": "" if medicion.imc is None else f"{medicion.imc:.1f}",
+                    "codigo": medicion.codigo
+                }
+                for medicion in reversed(historial)  # Mostrar más recientes primero
+            ]
+            self._historial_rv = historial
         except Exception as e:
             print("Error al cargar historial:", e)
     
-    def exportar_historial(self):
-        try:
-            if os.path.exists(CalculadoraIMC.imc_history_file):
-                with open(CalculadoraIMC.imc_history_file, "r", encoding="utf-8") as f:
-                    historial = json.load(f)
-                
-                # Crear archivo CSV
-                csv_file = "historial_imc.csv"
-                import csv
-                with open(csv_file, "w", newline="", encoding="utf-8") as f:
-                    writer = csv.writer(f)
-                    writer.writerow(["Fecha", "Peso (kg)", "Talla (cm)", "Edad (meses)", "IMC", "Interpretación"])
-                    for calculo in historial:
-                        writer.writerow([
-                            calculo["fecha"],
-                            calculo["peso_kg"],
-                            calculo["talla_cm"],
-                            calculo["edad_meses"],
-                            calculo["imc"],
-                            calculo["interpretacion"].replace("\n", " ")
-                        ])
-                self.ids.status_label.text = f"Historial exportado a {csv_file}"
-        except Exception as e:
-            self.ids.status_label.text = f"Error al exportar: {str(e)}"
+    def exportar_historial(self, formato="csv"):
+        # Segundo toque mientras exporta: cancelar
+        if self.exportacion and self.exportacion.activo():
+            self.exportacion.cancelar()
+            return
+        self.exportando = True
+        self.exportacion = App.get_running_app().exportar("historial", formato, self._estado_exportacion)
+
+    @mainthread
+    def _estado_exportacion(self, texto, terminado=False):
+        self.ids.status_label.text = texto
+        if terminado:
+            self.exportando = False
 
 class CalculadoraIMC(Screen):
     peso = StringProperty("3.0")
     talla = StringProperty("50.0")
     edad = StringProperty("0")
+    # "M", "F" o "" (sin indicar: se usan los puntos de corte fijos)
+    sexo = StringProperty("")
+    # Sin las tablas OMS el sexo no cambia nada: el selector se oculta
+    oms_disponible = BooleanProperty(False)
+    # Bebé (id de RegistroLocal) al que se asignan las mediciones; "" = sin asignar
+    registro_id = StringProperty("")
+    bebes = ListProperty([])
     resultado = StringProperty("")
     interpretacion = StringProperty("Mueva los controles deslizantes para ajustar los valores")
+    # Formatos anteriores (arreglo JSON y journal JSON Lines), se importan a la base SQLite
     imc_history_file = "lactasegura_imc_history.json"
+    imc_journal_file = "lactasegura_imc_history.jsonl"
+    # Segundos sin cambios en los deslizadores antes de guardar la medición
+    espera_guardado = 1.5
+    estado_guardado = StringProperty("")
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -374,96 +473,95 @@ class CalculadoraIMC(Screen):
             edad_meses = float(self.edad.replace(',', '.'))
             
             # Validar rangos con mensajes específicos
-            if not (0.5 <= peso <= 30):
-                self.interpretacion = "[color=ff0000]El peso debe estar entre 0.5 y 30 kg[/color]"
-                self.resultado = ""
-                return
-            
-            if not (30 <= talla_cm <= 120):
-                self.interpretacion = "[color=ff0000]La talla debe estar entre 30 y 120 cm[/color]"
-                self.resultado = ""
-                return
-            
-            if not (0 <= edad_meses <= 36):
-                self.interpretacion = "[color=ff0000]La edad debe estar entre 0 y 36 meses[/color]"
+            error = imc_motor.validar(peso, talla_cm, edad_meses)
+            if error:
+                self.interpretacion = f"[color=ff0000]{error}[/color]"
                 self.resultado = ""
                 return
             
-            # Calcular IMC
-            talla_m = talla_cm / 100.0
-            imc = peso / (talla_m ** 2)
+            # Con sexo y tablas OMS: puntaje z del IMC para la edad; si no, puntos de corte fijos
+            evaluacion = imc_motor.evaluar(peso, talla_cm, edad_meses, self.sexo,
+                                           App.get_running_app().crecimiento)
+            imc = evaluacion["imc"]
             self.resultado = f"{imc:.1f}"
+            self.interpretacion = imc_motor.interpretacion(
+                evaluacion["codigo"], imc, peso, talla_cm, edad_meses,
+                evaluacion["z"], evaluacion["percentil"])
             
-            # Interpretación según la edad
-            if edad_meses <= 24:
-                rango_bajo = 13
-                rango_normal = 14
-                rango_alto = 17
-            else:
-                rango_bajo = 14
-                rango_normal = 15
-                rango_alto = 18
-            
-            # Preparar texto de interpretación con colores
-            if imc < rango_bajo:
-                estado = "[color=ff0000]ATENCIÓN: Posible bajo peso severo[/color]"
-                recomendacion = "[b]Consulte URGENTEMENTE a un profesional de la salud.[/b]"
-            elif imc < rango_normal:
-                estado = "[color=ffa500]Alerta: Bajo peso[/color]"
-                recomendacion = "[b]Se recomienda consultar a un pediatra para evaluación.[/b]"
-            elif imc < rango_alto:
-                estado = "[color=008000]IMC dentro de rangos esperados para la edad[/color]"
-                recomendacion = "[b]Continúe con los controles regulares.[/b]"
-            else:
-                estado = "[color=ffa500]IMC por encima del rango esperado[/color]"
-                recomendacion = "[b]Consulte con su pediatra en el próximo control.[/b]"
-            
-            self.interpretacion = f"{estado}\n\n{recomendacion}\n\nIMC calculado: {imc:.1f}\nPeso: {peso:.1f} kg\nTalla: {talla_cm:.1f} cm\nEdad: {int(edad_meses)} meses\n\n[i]Recordatorio: Este cálculo es solo orientativo.\nSiempre siga las recomendaciones de su profesional de salud.[/i]"
-            
-            # Guardar automáticamente en el historial
-            self.guardar_calculo(imc, self.interpretacion)
+            # Programar el guardado; el escritor en segundo plano agrupa la ráfaga del deslizador
+            self.guardar_calculo(imc, evaluacion["codigo"])
             
         except ValueError as e:
             print(f"Error en cálculo: {e}")
             self.resultado = ""
             self.interpretacion = "[color=ff0000]Error en el cálculo. Verifique los valores ingresados.[/color]"
 
+    def on_sexo(self, instance, value):
+        if self.peso and self.talla and self.edad:
+            self.actualizar_calculo()
+
+    def seleccionar_bebe(self, texto):
+        registro_id = _id_de_opcion(texto)
+        if registro_id == self.registro_id:
+            return
+        # La medición pendiente es del bebé anterior: se escribe (y se espera) antes de cambiar
+        self.confirmar_guardado(esperar=True)
+        self.registro_id = registro_id
+        # Los valores actuales ya quedaron guardados para el bebé anterior: sólo se
+        # actualiza lo que se muestra, sin programar una medición para el nuevo
+        self._ultima_clave = (self.peso, self.talla, self.edad, self.sexo, self.registro_id)
+        if self.peso and self.talla and self.edad:
+            self.actualizar_calculo()
+
     def on_enter(self):
         # Limpiar campos al entrar
         self.peso = ""
         self.talla = ""
         self.edad = ""
         self.resultado = ""
+        self.estado_guardado = ""
         self.interpretacion = "Ingrese los datos del bebé para calcular su IMC"
-        
-    def guardar_calculo(self, imc, interpretacion):
-        """Guarda el cálculo en el historial"""
+        app = App.get_running_app()
+        self.bebes = app.opciones_bebes("Sin bebé asignado")
+        self.oms_disponible = app.crecimiento.disponible("imc")
+        if not self.oms_disponible:
+            self.sexo = ""
+
+    def on_leave(self):
+        # No perder la última medición si se sale antes de que termine la espera
+        self.confirmar_guardado()
+
+    def confirmar_guardado(self, esperar=False):
+        """Guarda de inmediato la medición pendiente (botón Guardar); con `esperar`, hasta que esté escrita"""
+        try:
+            App.get_running_app().guardado_historial.confirmar(esperar)
+        except Exception as e:
+            print("Error al confirmar el guardado:", e)
+
+    @mainthread
+    def _calculo_guardado(self, calculo):
+        self.estado_guardado = "Cálculo guardado en el historial."
+
+    def guardar_calculo(self, imc, codigo):
+        """Programa el guardado del cálculo (valores y código de clasificación) en el historial"""
         try:
             from datetime import datetime
-            # Cargar historial existente
-            if os.path.exists(self.imc_history_file):
-                with open(self.imc_history_file, "r", encoding="utf-8") as f:
-                    historial = json.load(f)
-            else:
-                historial = []
-            
-            # Añadir nuevo cálculo
+            clave = (self.peso, self.talla, self.edad, self.sexo, self.registro_id)
+            if clave == getattr(self, '_ultima_clave', None):
+                return
+            self._ultima_clave = clave
             calculo = {
                 "fecha": datetime.now().isoformat(),
                 "peso_kg": self.peso,
                 "talla_cm": self.talla,
                 "edad_meses": self.edad,
+                "sexo": self.sexo,
                 "imc": imc,
-                "interpretacion": interpretacion
+                "codigo": codigo,
+                "registro_id": self.registro_id
             }
-            historial.append(calculo)
-            
-            # Guardar historial actualizado
-            with open(self.imc_history_file, "w", encoding="utf-8") as f:
-                json.dump(historial, f, ensure_ascii=False, indent=2)
-            
-            # Mostrar mensaje en la interpretación
-            self.interpretacion += "\n\nCálculo guardado en el historial."
+            self.estado_guardado = "Guardado pendiente..."
+            App.get_running_app().guardado_historial.programar(calculo)
         except Exception as e:
             print("Error al guardar el cálculo:", e)
     
@@ -476,15 +574,10 @@ class CalculadoraIMC(Screen):
             texto = texto.replace(',', '.')
             valor = float(texto)
             
-            if tipo == 'peso':
-                # Rango razonable para bebés: 0.5 kg a 30 kg
-                return 0.5 <= valor <= 30
-            elif tipo == 'talla':
-                # Rango razonable para bebés: 30 cm a 120 cm
-                return 30 <= valor <= 120
-            elif tipo == 'edad':
-                # Rango razonable: 0 a 36 meses
-                return 0 <= valor <= 36
+            # Rangos razonables para bebés (imc.RANGOS): peso, talla y edad
+            if tipo in imc_motor.RANGOS:
+                minimo, maximo, _ = imc_motor.RANGOS[tipo]
+                return minimo <= valor <= maximo
             return True
         except ValueError:
             return False
@@ -500,157 +593,158 @@ class CalculadoraIMC(Screen):
     def calcular(self):
         """Método mantenido para compatibilidad con el botón existente"""
         self.actualizar_calculo()
+def _diferencias_vista(viejas, nuevas, max_ops=64):
+    """Calcula las ediciones (inicio, fin, filas) que llevan las filas `viejas` a `nuevas`.
+
+    Alinea ambas listas por `rec_id` recorriéndolas una sola vez. Una fila con
+    el mismo id sólo se conserva si es el mismo objeto (`_fila` reutiliza el
+    dict mientras el registro no cambie); si no, se reemplaza en su lugar.
+    Devuelve None si el orden relativo cambió o si hacen falta más de
+    `max_ops` ediciones.
+    """
+    viejos = [f["rec_id"] for f in viejas]
+    nuevos = [f["rec_id"] for f in nuevas]
+    en_viejos = set(viejos)
+    en_nuevos = set(nuevos)
+    ops = []
+    i = j = 0
+    while i < len(viejos) or j < len(nuevos):
+        if i < len(viejos) and j < len(nuevos) and viejos[i] == nuevos[j]:
+            if viejas[i] is not nuevas[j]:
+                # Mismo registro con otro contenido: reemplazar sólo esa fila
+                if ops and ops[-1][1] == i:
+                    inicio, _, filas = ops[-1]
+                    ops[-1] = (inicio, i + 1, filas + [nuevas[j]])
+                else:
+                    ops.append((i, i + 1, [nuevas[j]]))
+                    if len(ops) > max_ops:
+                        return None
+            i += 1
+            j += 1
+            continue
+        inicio_i, inicio_j = i, j
+        while i < len(viejos) and viejos[i] not in en_nuevos:
+            i += 1
+        while j < len(nuevos) and nuevos[j] not in en_viejos:
+            j += 1
+        if i == inicio_i and j == inicio_j:
+            return None
+        ops.append((inicio_i, i, nuevas[inicio_j:j]))
+        if len(ops) > max_ops:
+            return None
+    return ops
+
+class RegistroItem(Label):
+    """Fila reciclable de la lista de registros (ver <RegistroItem> en el KV)"""
+    rec_id = StringProperty("")
+
 class RegistroLocal(Screen):
-    records_file = "lactasegura_records.json"
+    records_file = "lactasegura_records.json"  # formato anterior, se importa a la base SQLite
     records = ListProperty([])
     filtered_records = ListProperty([])
+    exportando = BooleanProperty(False)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.exportacion = None
+        self._filas = {}
+        self.indice = IndiceRegistros()
+        self._consulta = {"texto": None, "edad_min": None, "edad_max": None, "criterio": None}
     
     def on_pre_enter(self, *args):
         self.load_records()
-        self.filtered_records = self.records.copy()
-        
+
     def buscar_registros(self, texto_busqueda):
-        if not texto_busqueda:
-            self.filtered_records = self.records.copy()
-        else:
-            self.filtered_records = [
-                r for r in self.records
-                if texto_busqueda.lower() in r['nombre'].lower() or
-                   texto_busqueda in r['fecha'] or
-                   texto_busqueda in r['edad_meses'] or
-                   texto_busqueda in r['peso_kg']
-            ]
-        self.actualizar_vista_registros()
+        self._consulta['texto'] = texto_busqueda
+        self.aplicar_consulta()
         
     def filtrar_por_edad(self, min_edad, max_edad):
         try:
-            min_edad = float(min_edad) if min_edad else 0
-            max_edad = float(max_edad) if max_edad else 999
-            self.filtered_records = [
-                r for r in self.records
-                if min_edad <= float(r['edad_meses']) <= max_edad
-            ]
-            self.actualizar_vista_registros()
+            self._consulta['edad_min'] = float(min_edad) if min_edad else None
+            self._consulta['edad_max'] = float(max_edad) if max_edad else None
+            self.aplicar_consulta()
         except ValueError:
             print("Error: Ingrese valores numéricos válidos para el rango de edad")
             
     def ordenar_registros(self, criterio):
-        if criterio == 'fecha':
-            self.filtered_records.sort(key=lambda x: x['fecha'], reverse=True)
-        elif criterio == 'nombre':
-            self.filtered_records.sort(key=lambda x: x['nombre'].lower())
-        elif criterio == 'edad':
-            self.filtered_records.sort(key=lambda x: float(x['edad_meses']))
-        elif criterio == 'peso':
-            self.filtered_records.sort(key=lambda x: float(x['peso_kg']))
+        self._consulta['criterio'] = criterio
+        self.aplicar_consulta()
+
+    def aplicar_consulta(self):
+        """Combina búsqueda, rango de edad y orden actuales usando el índice"""
+        self.filtered_records = self.indice.consultar(**self._consulta)
         self.actualizar_vista_registros()
-    
-    def on_pre_enter(self, *args):
-        self.load_records()
-        
+
+    def _fila(self, record):
+        # Diccionario liviano para el RecycleView, reutilizado mientras el registro no cambie
+        origen, fila = self._filas.get(record.id, (None, None))
+        if origen is not record:
+            fila = {
+                "rec_id": record.id,
+                "text": f"[{record.fecha}] {record.nombre}\nEdad: {formatear_numero(record.edad_meses)} meses, "
+                        f"Peso: {formatear_numero(record.peso_kg)} kg\nObs: {record.observacion}"
+            }
+            self._filas[record.id] = (record, fila)
+        return fila
+
+    def actualizar_vista_registros(self):
+        """Aplica `filtered_records` al RecycleView como diferencias sobre los datos actuales"""
+        try:
+            data = self.ids.registros_rv.data
+        except Exception:
+            return
+        nuevas = [self._fila(r) for r in self.filtered_records]
+        ops = _diferencias_vista(data, nuevas)
+        if ops is None:
+            # Reordenamiento o demasiados cambios: reemplazar los datos (los widgets se reciclan igual)
+            self.ids.registros_rv.data = nuevas
+            return
+        for inicio, fin, filas in reversed(ops):
+            data[inicio:fin] = filas
+
     def load_records(self):
-        if os.path.exists(self.records_file):
-            try:
-                with open(self.records_file, "r", encoding="utf-8") as f:
-                    self.records = json.load(f)
-            except Exception:
-                self.records = []
-        else:
-            self.records = []
-    
-    def exportar_registros(self):
         try:
-            if self.records:
-                # Crear archivo Excel
-                csv_file = "registros_lactasegura.csv"
-                import csv
-                with open(csv_file, "w", newline="", encoding="utf-8") as f:
-                    writer = csv.writer(f)
-                    writer.writerow(["ID", "Fecha", "Nombre", "Edad (meses)", "Peso (kg)", "Observación"])
-                    for record in self.records:
-                        writer.writerow([
-                            record["id"],
-                            record["fecha"],
-                            record["nombre"],
-                            record["edad_meses"],
-                            record["peso_kg"],
-                            record["observacion"]
-                        ])
-                self.ids.status_label.text = f"Registros exportados a {csv_file}"
-            else:
-                self.ids.status_label.text = "No hay registros para exportar"
+            # Copia: la lista del caché es compartida y esta pantalla la modifica
+            self.records = list(App.get_running_app().datos.registros())
         except Exception as e:
-            self.ids.status_label.text = f"Error al exportar: {str(e)}"
+            print("Error al cargar registros:", e)
+            self.records = []
+        # El índice se construye una vez por carga; luego lo mantienen save/editar/delete
+        self.indice = IndiceRegistros(self.records)
+        self.aplicar_consulta()
+    
+    def exportar_registros(self, formato="csv"):
+        # Segundo toque mientras exporta: cancelar
+        if self.exportacion and self.exportacion.activo():
+            self.exportacion.cancelar()
+            return
+        self.exportando = True
+        self.exportacion = App.get_running_app().exportar("registros", formato, self._estado_exportacion)
+
+    @mainthread
+    def _estado_exportacion(self, texto, terminado=False):
+        self.ids.status_label.text = texto
+        if terminado:
+            self.exportando = False
     
     def editar_registro(self, rec_id, nombre, edad, peso, observacion):
         try:
             # Encontrar y actualizar el registro
             for record in self.records:
-                if record["id"] == rec_id:
-                    record["nombre"] = nombre
-                    record["edad_meses"] = edad
-                    record["peso_kg"] = peso
-                    record["observacion"] = observacion
+                if record.id == rec_id:
+                    # Valida antes de tocar el registro: un número inválido no borra el anterior
+                    record.actualizar(nombre, edad, peso, observacion)
+                    # Guardar cambios (sólo esta fila)
+                    App.get_running_app().db.registros.actualizar(record.como_dict())
+                    self._filas.pop(rec_id, None)
+                    self.indice.actualizar(record)
                     break
             
-            # Guardar cambios
-            with open(self.records_file, "w", encoding="utf-8") as f:
-                json.dump(self.records, f, ensure_ascii=False, indent=2)
-            
-            # Recargar registros
-            self.load_records()
+            self.aplicar_consulta()
             self.ids.status_label.text = "Registro actualizado"
         except Exception as e:
             self.ids.status_label.text = f"Error al editar: {str(e)}"
-        
-        # Mostrar los registros en la interfaz
-        records_grid = self.ids.content_grid
-        # Limpiar widgets existentes y mantener inputs/buttons (pero no re-ponerlos aún)
-        children_to_keep = [c for c in records_grid.children if isinstance(c, (Button, TextInput))]
-        records_grid.clear_widgets()
-
-        # Preparar lista para labels y deshacer bindings previos si existen
-        if not hasattr(self, '_record_labels'):
-            self._record_labels = []
-        else:
-            # vaciar lista de labels anteriores
-            self._record_labels.clear()
-
-        # Si teníamos un binding previo al ancho, quitarlo para evitar múltiples binds
-        if hasattr(self, '_width_bind'):
-            try:
-                records_grid.unbind(width=self._width_bind)
-            except Exception:
-                pass
-            del self._width_bind
-
-        # Primero agregar las etiquetas de los registros (de modo que queden debajo de los inputs/buttons)
-        for record in self.records:
-            record_text = f"[{record['fecha']}] {record['nombre']}\nEdad: {record['edad_meses']} meses, Peso: {record['peso_kg']} kg\nObs: {record['observacion']}"
-            lbl = Label(
-                text=record_text,
-                size_hint_y=None,
-                height='80dp',
-                text_size=(records_grid.width - 20, None),
-                halign='left'
-            )
-            self._record_labels.append(lbl)
-            records_grid.add_widget(lbl)
 
-        # Hacer un único bind para actualizar text_size de todas las labels cuando cambie el ancho
-        def _sync_text_size(grid, value):
-            for label in self._record_labels:
-                try:
-                    label.text_size = (grid.width - 20, None)
-                except Exception:
-                    pass
-
-        self._width_bind = _sync_text_size
-        records_grid.bind(width=self._width_bind)
-
-        # Finalmente, re-agregar los inputs/buttons para que queden encima y sigan siendo interactivos
-        for child in reversed(children_to_keep):
-            records_grid.add_widget(child)
 
     def on_touch_down(self, touch):
         # Registro simple para depurar la recepción de toques en esta pantalla
@@ -660,32 +754,24 @@ class RegistroLocal(Screen):
             pass
         return super().on_touch_down(touch)
 
-    def on_pre_leave(self, *args):
-        # Limpiar bindings para evitar fugas y datos obsoletos
-        try:
-            if hasattr(self, '_width_bind'):
-                self.ids.content_grid.unbind(width=self._width_bind)
-                del self._width_bind
-        except Exception:
-            pass
     def save_record(self, nombre, edad, peso, observacion):
-        rec = {
-            "id": str(len(self.records)+1),
-            "fecha": __import__('datetime').datetime.now().isoformat(),
-            "nombre": nombre,
-            "edad_meses": edad,
-            "peso_kg": peso,
-            "observacion": observacion
-        }
+        nuevo = Registro("", datetime.now().isoformat())
+        try:
+            nuevo.actualizar(nombre, edad, peso, observacion)
+        except ValueError as e:
+            self.ids.status_label.text = str(e)
+            return
+        # La base asigna un id autoincremental estable (no se repite tras borrar)
+        rec = Registro.desde_dict(App.get_running_app().db.registros.agregar(nuevo.como_dict()))
         self.records.append(rec)
-        with open(self.records_file, "w", encoding="utf-8") as f:
-            json.dump(self.records, f, ensure_ascii=False, indent=2)
-        self.load_records()
+        self.indice.agregar(rec)
+        self.aplicar_consulta()
     def delete_record(self, rec_id):
-        self.records = [r for r in self.records if r["id"] != rec_id]
-        with open(self.records_file, "w", encoding="utf-8") as f:
-            json.dump(self.records, f, ensure_ascii=False, indent=2)
-        self.load_records()
+        App.get_running_app().db.registros.eliminar(rec_id)
+        self.records = [r for r in self.records if r.id != rec_id]
+        self.indice.eliminar(rec_id)
+        self._filas.pop(rec_id, None)
+        self.aplicar_consulta()
 
 class Acerca(Screen):
     def on_enter(self):
@@ -696,9 +782,20 @@ class Acerca(Screen):
         if hasattr(app, 'cloud_sync'):
             self.ids.sync_status.text = app.cloud_sync.sync_status
             
+    # Las operaciones de red se encargan al trabajador de sincronización;
+    # los resultados vuelven al hilo principal con @mainthread.
     def iniciar_sesion(self, username, password):
         app = App.get_running_app()
-        if app.cloud_sync.authenticate(username, password):
+        self.ids.sync_status.text = "Iniciando sesión..."
+        app.sync_worker.encargar(
+            partial(app.cloud_sync.authenticate, username, password),
+            self._sesion_iniciada
+        )
+
+    @mainthread
+    def _sesion_iniciada(self, ok):
+        app = App.get_running_app()
+        if ok:
             self.ids.sync_status.text = "Autenticado correctamente"
             app.notification_manager.send_notification(
                 "LactaSegura",
@@ -709,8 +806,16 @@ class Acerca(Screen):
             
     def sincronizar(self):
         app = App.get_running_app()
-        if app.cloud_sync.sync_data():
-            app.notification_manager.send_notification(
+        self.ids.sync_status.text = "Sincronizando..."
+        app.sync_worker.encargar(
+            partial(app.cloud_sync.sync_data, progreso=app._progreso_sync),
+            self._sincronizado
+        )
+
+    @mainthread
+    def _sincronizado(self, ok):
+        if ok:
+            App.get_running_app().notification_manager.send_notification(
                 "LactaSegura",
                 "Datos sincronizados correctamente"
             )
@@ -718,72 +823,136 @@ class Acerca(Screen):
         
     def restaurar(self):
         app = App.get_running_app()
-        if app.cloud_sync.restore_data():
-            app.notification_manager.send_notification(
+        self.ids.sync_status.text = "Restaurando..."
+        app.sync_worker.encargar(app.cloud_sync.restore_data, self._restaurado)
+
+    @mainthread
+    def _restaurado(self, ok):
+        if ok:
+            App.get_running_app().notification_manager.send_notification(
                 "LactaSegura",
                 "Datos restaurados correctamente"
             )
-            self.actualizar_estado_sync()
+        self.actualizar_estado_sync()
 
 class NotificationManager:
+    @staticmethod
+    def _notificar(title, message):
+        # plyer se importa al enviar la primera notificación
+        plyer = importar("plyer")
+        if plyer is None:
+            print(f"Notificación: {title} - {message}")
+            return
+        plyer.notification.notify(title=title, message=message, app_icon=None, timeout=10)
+
     @staticmethod
     def send_notification(title, message):
         try:
-            notification.notify(
-                title=title,
-                message=message,
-                app_icon=None,
-                timeout=10
-            )
+            NotificationManager._notificar(title, message)
         except Exception as e:
             print(f"Error al enviar notificación: {e}")
 
     @staticmethod
     def schedule_reminder(fecha_control):
         try:
-            notification.notify(
-                title="Recordatorio de Control",
-                message=f"Tienes un control programado para {fecha_control}",
-                app_icon=None,
-                timeout=10
+            NotificationManager._notificar(
+                "Recordatorio de Control",
+                f"Tienes un control programado para {fecha_control}"
             )
         except Exception as e:
             print(f"Error al programar recordatorio: {e}")
 
 class CloudSync:
-    def __init__(self):
-        self.sync_status = StringProperty("No sincronizado")
+    # Cantidad máxima de cambios por lote enviado
+    tam_lote = 500
+
+    def __init__(self, db=None, remote_url=None):
+        self.db = db
+        self.remote_url = remote_url
+        self.sync_status = "No sincronizado"
         self.last_sync = None
         self.auth_token = None
         self._sync_file = "sync_status.json"
+        # Versión del último cambio enviado: sólo se sube lo posterior
+        self.cursor = 0
+        self._cargar_estado()
         
     def authenticate(self, username, password):
         try:
             # Simulación de autenticación
             if username and password:
                 self.auth_token = "token_simulado"
+                # La sesión sobrevive al reinicio: los cambios en cola se suben sin volver a entrar
+                self._guardar_estado()
                 return True
             return False
         except Exception as e:
             print(f"Error de autenticación: {e}")
             return False
+
+    def _cargar_estado(self):
+        try:
+            if os.path.exists(self._sync_file):
+                with open(self._sync_file, "r", encoding="utf-8") as f:
+                    estado = json.load(f)
+                self.cursor = int(estado.get("cursor", 0))
+                self.auth_token = estado.get("auth_token") or None
+                if estado.get("last_sync"):
+                    self.last_sync = datetime.fromisoformat(estado["last_sync"])
+                    self.sync_status = f"Última sincronización: {self.last_sync.strftime('%d/%m/%Y %H:%M')}"
+        except Exception as e:
+            print("Error al leer estado de sincronización:", e)
+        try:
+            # Sin sesión los cambios en cola no se pueden subir: avisarlo en lugar de esperar en silencio
+            if not self.auth_token and self.db is not None and self.db.version_actual() > self.cursor:
+                self.sync_status = "Hay cambios sin sincronizar: inicie sesión para subirlos"
+        except Exception as e:
+            print("Error al revisar cambios pendientes:", e)
+
+    def _guardar_estado(self):
+        estado = {
+            "cursor": self.cursor,
+            "last_sync": self.last_sync.isoformat() if self.last_sync else None,
+            "auth_token": self.auth_token
+        }
+        tmp = self._sync_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(estado, f)
+        os.replace(tmp, self._sync_file)
+
+    def _transporte(self):
+        # Sin servidor configurado se simula la nube en backup.json
+        if self.remote_url:
+            return TransporteHttp(self.remote_url, self.auth_token)
+        return TransporteLocal("backup.json")
             
-    def sync_data(self):
+    def pendientes(self):
+        """Hay cambios locales sin subir (y una sesión con la cual subirlos)"""
+        return bool(self.auth_token) and self.db.version_actual() > self.cursor
+
+    def sync_data(self, progreso=None):
         try:
             if not self.auth_token:
                 raise Exception("No autenticado")
                 
-            # Recopilar datos para sincronizar
-            data = {
-                "imc_history": self._read_file(CalculadoraIMC.imc_history_file),
-                "records": self._read_file(RegistroLocal.records_file)
-            }
-            
-            # Simular envío a la nube
-            self._save_backup(data)
+            # Sólo lo que cambió desde la última sincronización, en lotes comprimidos
+            cambios = self.db.cambios_desde(self.cursor)
+            transporte = self._transporte()
+            enviados = 0
+            for lote in dividir_en_lotes(cambios, self.tam_lote):
+                transporte.enviar(comprimir_lote(lote, self.cursor))
+                # Avanzar el cursor lote a lote: si se corta, se retoma desde aquí
+                self.cursor = lote[-1]["version"]
+                self._guardar_estado()
+                enviados += len(lote)
+                if progreso:
+                    progreso(enviados, len(cambios))
+            if cambios:
+                self.db.purgar_borrados(self.cursor)
             
             self.last_sync = datetime.now()
-            self.sync_status = f"Última sincronización: {self.last_sync.strftime('%d/%m/%Y %H:%M')}"
+            self._guardar_estado()
+            self.sync_status = f"Última sincronización: {self.last_sync.strftime('%d/%m/%Y %H:%M')} ({len(cambios)} cambios)"
             return True
             
         except Exception as e:
@@ -793,91 +962,228 @@ class CloudSync:
     def restore_data(self):
         try:
             # Cargar respaldo
-            backup = self._read_file("backup.json")
+            backup = self._transporte().descargar()
             if not backup:
                 raise Exception("No hay respaldo disponible")
                 
             # Restaurar datos
-            self._write_file(CalculadoraIMC.imc_history_file, backup.get("imc_history", []))
-            self._write_file(RegistroLocal.records_file, backup.get("records", []))
+            self.db.historial.reemplazar(backup.get("imc_history") or [])
+            self.db.registros.reemplazar(backup.get("records") or [])
+            # Lo restaurado ya está en la nube: no volver a subirlo
+            self.cursor = self.db.version_actual()
+            self.db.purgar_borrados(self.cursor)
+            self._guardar_estado()
             
             return True
         except Exception as e:
             print(f"Error al restaurar datos: {e}")
             return False
-            
-    def _read_file(self, filename):
-        try:
-            if os.path.exists(filename):
-                with open(filename, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            return None
-        except Exception:
-            return None
-            
-    def _write_file(self, filename, data):
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-            
-    def _save_backup(self, data):
-        self._write_file("backup.json", data)
+
+class TareasPeriodicas:
+    """Registro único de tareas periódicas con nombre.
+
+    Programar una tarea con un nombre ya registrado reemplaza la anterior, de
+    modo que volver a entrar a una pantalla nunca acumula temporizadores.
+    """
+
+    def __init__(self):
+        self._eventos = {}
+
+    def programar(self, nombre, callback, intervalo):
+        self.cancelar(nombre)
+        self._eventos[nombre] = Clock.schedule_interval(callback, intervalo)
+
+    def cancelar(self, nombre):
+        evento = self._eventos.pop(nombre, None)
+        if evento is not None:
+            evento.cancel()
+
+    def cancelar_todas(self):
+        for nombre in list(self._eventos):
+            self.cancelar(nombre)
+
+    def vincular_pantalla(self, pantalla, nombre, callback, intervalo, al_entrar=True):
+        """Programa la tarea al entrar a `pantalla` y la cancela al salir"""
+        def _entrar(*args):
+            if al_entrar:
+                callback(0)
+            self.programar(nombre, callback, intervalo)
+        pantalla.bind(on_enter=_entrar, on_leave=lambda *args: self.cancelar(nombre))
+
+    @property
+    def activas(self):
+        """Cantidad de tareas vivas (para detectar fugas de temporizadores)"""
+        return sum(1 for ev in self._eventos.values() if ev.is_triggered)
+
+    def nombres(self):
+        return sorted(self._eventos)
 
 class LactaSeguraApp(App):
+    db_file = "lactasegura.db"
+    # Columnas numéricas del historial para gráficos (columns.py), al día con la base
+    history_columns_file = "lactasegura_historial.cols"
+    search_index_file = "lactasegura_search_index.json"
+    startup_report_file = "lactasegura_startup.json"
+    # Carpeta de las exportaciones, dentro de user_data_dir
+    export_dir = "exportaciones"
+    kv_cache_file = "lactasegura_kv.cache"
+    # Tablas LMS de la OMS (formato WHO Anthro), junto a main.py
+    growth_tables_dir = "who_growth"
+    # Registro de pantallas: se instancian en el primer abrir_pantalla(nombre)
+    pantallas = {
+        "splash": SplashScreen,
+        "menu": MainMenu,
+        "madres": GuiaMadres,
+        "enfermeros": GuiaEnfermeros,
+        "articulos": Articulos,
+        "resumen": ResumenArticulo,
+        "imc": CalculadoraIMC,
+        "historial": HistorialIMC,
+        "registro": RegistroLocal,
+        "acerca": Acerca,
+    }
+
+    def load_kv(self, filename=None):
+        # Reglas KV desde el caché preprocesado (kv_cache.py) si lactasegura.kv no cambió
+        arranque.marcar("ventana")
+        path = filename or os.path.join(self.kv_directory or self.directory, self.kv_file or "lactasegura.kv")
+        if not os.path.exists(path):
+            return False
+        inicio = arranque.transcurrido()
+        origen = cargar_kv(path, self.kv_cache_file)
+        arranque.sumar(f"kv ({origen})", arranque.transcurrido() - inicio)
+        arranque.marcar("kv")
+        return True
+
     def build(self):
         self.title = "LactaSegura"
+        self._articles_cache_file = "lactasegura_articles_cache.json"
+        self._remote_config_file = "remote_config.json"
+        self.articles_cache = CacheHttp(self._articles_cache_file)
+        self.catalogo = CatalogoArticulos(self.articles_cache)
+        self.buscador = IndiceBusqueda(self.search_index_file)
+        self._buscador_cargado = False
+        self._indexando = threading.Lock()
+        cfg = self.load_remote_config()
+        if not isinstance(cfg, dict):
+            cfg = {}
         self.notification_manager = NotificationManager()
-        self.cloud_sync = CloudSync()
-        sm = ScreenManager(transition=SlideTransition())
-        sm.add_widget(SplashScreen(name="splash"))
-        sm.add_widget(MainMenu(name="menu"))
-        sm.add_widget(GuiaMadres(name="madres"))
-        sm.add_widget(GuiaEnfermeros(name="enfermeros"))
-        sm.add_widget(Articulos(name="articulos"))
-        sm.add_widget(ResumenArticulo(name="resumen"))
-        sm.add_widget(CalculadoraIMC(name="imc"))
-        sm.add_widget(RegistroLocal(name="registro"))
-        sm.add_widget(Acerca(name="acerca"))
-        # Mostrar la pantalla de inicio (SplashScreen) al arrancar
-        try:
-            sm.current = 'splash'
-        except Exception:
-            pass
+        self.db = BaseDatos(self.db_file, columnas_path=self.history_columns_file)
+        # Importación única de los archivos JSON de versiones anteriores
+        importar_json(self.db, RegistroLocal.records_file,
+                      CalculadoraIMC.imc_journal_file, CalculadoraIMC.imc_history_file)
+        self.historial_store = self.db.historial
+        # Lecturas compartidas de historial y registros, invalidadas por cada escritura
+        self.datos = CacheDatos(self.db)
+        self.guardado_historial = GuardadoDiferido(
+            self.historial_store.agregar,
+            espera=CalculadoraIMC.espera_guardado,
+            al_guardar=self._calculo_guardado
+        )
+        self.crecimiento = MotorCrecimiento(os.path.join(self.directory, self.growth_tables_dir))
+        self.cloud_sync = CloudSync(self.db, remote_url=cfg.get("remote_sync_url"))
+        self.tareas = TareasPeriodicas()
+        self.sync_worker = TrabajadorSync(
+            partial(self.cloud_sync.sync_data, progreso=self._progreso_sync),
+            self.cloud_sync.pendientes
+        )
+        self.conexion = MonitorConexion()
+        self.conexion.agregar_oyente(self._conexion_cambiada)
+        self.conexion.agregar_oyente(self.sync_worker.conexion_cambiada)
+        self._refresco_pendiente = False
         # internal articles data (can be loaded from remote or cache)
         self.articles = ARTICLES.copy()
-        self._articles_cache_file = "lactasegura_articles_cache.json"
-        self._remote_config_file = "remote_config.json"
+        # Sólo la pantalla de inicio se construye ahora; el resto, al navegar a ella
+        sm = ScreenManager(transition=SlideTransition())
+        self.root = sm
+        self.pantalla('splash')
+        sm.current = 'splash'
         return sm
+
+    def opciones_bebes(self, primera):
+        """Opciones de la lista de bebés: `primera` (ninguno) y "Nombre (#id)" por registro"""
+        return [primera] + [f"{r.nombre} (#{r.id})" for r in self.datos.registros()]
+
+    def pantalla(self, name):
+        """Devuelve la pantalla `name`, creándola (y registrándola) la primera vez"""
+        if self.root.has_screen(name):
+            return self.root.get_screen(name)
+        clase = self.pantallas[name]
+        with arranque.medir("pantalla " + name):
+            screen = clase(name=name)
+        if name == 'menu':
+            self.tareas.vincular_pantalla(screen, 'menu_conexion', screen.check_connection, 30)
+        elif name == 'articulos':
+            screen.articles = self.articles or []
+        self.root.add_widget(screen)
+        return screen
         
     def on_stop(self):
         """Se llama cuando la aplicación se está cerrando"""
         cleanup_lock()  # Limpiar archivo de bloqueo
+        self.tareas.cancelar_todas()
+        self.conexion.detener(timeout=1)
+        self.sync_worker.detener(timeout=2)
+        print("Caché de datos:", self.datos.estadisticas())
+        # Escribir la medición pendiente antes de salir
+        try:
+            self.guardado_historial.cerrar()
+            self.db.cerrar()
+        except Exception as e:
+            print("Error al cerrar el guardado diferido:", e)
         return True
 
+    def _calculo_guardado(self, calculo):
+        # Llamado desde el hilo del escritor; la pantalla actualiza la UI con @mainthread
+        try:
+            self.root.get_screen('imc')._calculo_guardado(calculo)
+        except Exception:
+            pass
+
     def on_start(self):
+        arranque.marcar("build")
+        self.conexion.iniciar()
+        self.sync_worker.iniciar()
         # Load articles (from cache or remote if available) when app starts
         try:
-            self.load_articles()
+            with arranque.medir("load_articles"):
+                self.load_articles()
         except Exception as e:
             print("Error loading articles on start:", e)
+        arranque.marcar("on_start")
+        # El primer cuadro se dibuja después de on_start: ahí se ve la pantalla de inicio
+        Clock.schedule_once(self._splash_visible, 0)
+
+    def _splash_visible(self, dt):
+        arranque.marcar("splash")
+        print(arranque.texto("splash"))
+        try:
+            arranque.guardar(self.startup_report_file)
+        except Exception as e:
+            print("Error al guardar el informe de arranque:", e)
 
     # Network and sync helpers
-    def is_online(self, timeout=2):
-        # Try to detect connectivity. Prefer requests if available; otherwise use a socket probe.
-        if _HAS_REQUESTS:
-            try:
-                requests.get("https://www.google.com/", timeout=timeout)
-                return True
-            except Exception:
-                return False
-        else:
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(timeout)
-                sock.connect(("8.8.8.8", 53))
-                sock.close()
-                return True
-            except Exception:
-                return False
+    def is_online(self):
+        # Cached state from the background monitor; never blocks on the network.
+        return self.conexion.is_online()
+
+    @mainthread
+    def _progreso_sync(self, enviados, total):
+        try:
+            self.root.get_screen('acerca').ids.sync_status.text = f"Sincronizando... {enviados}/{total}"
+        except Exception:
+            pass
+
+    @mainthread
+    def _conexion_cambiada(self, online):
+        try:
+            self.root.get_screen('menu').set_connection(online)
+        except Exception:
+            pass
+        # A refresh skipped while offline runs as soon as we are back online
+        if online and self._refresco_pendiente:
+            self._refresco_pendiente = False
+            self.load_articles()
 
     def load_remote_config(self):
         if os.path.exists(self._remote_config_file):
@@ -896,34 +1202,32 @@ class LactaSeguraApp(App):
         except Exception as e:
             print("Failed saving remote config:", e)
 
-    def fetch_remote_articles(self, url, timeout=6):
-        # Attempt to fetch a JSON array of articles from `url`.
+    def fetch_remote_articles(self, url, timeout=6, force=False):
+        # Conditional GET of the article feed at `url` through the HTTP cache: either the
+        # legacy JSON array or the first page of the paginated catalogue.
+        # Returns None when the cached copy is still fresh or the server answers 304.
         if not url:
             raise ValueError("No remote URL configured")
-        if not _HAS_REQUESTS:
-            raise RuntimeError("requests package not available")
-        resp = requests.get(url, timeout=timeout)
-        resp.raise_for_status()
-        data = resp.json()
-        if not isinstance(data, list):
-            raise ValueError("Remote data is not a list of articles")
-        return data
+        return self.articles_cache.obtener(url, timeout=timeout, forzar=force, validar=normalizar_pagina)
 
     def _write_articles_cache(self, articles):
         try:
-            with open(self._articles_cache_file, "w", encoding="utf-8") as f:
-                json.dump(articles, f, ensure_ascii=False, indent=2)
+            self.articles_cache.escribir(articles)
         except Exception as e:
             print("Failed writing articles cache:", e)
 
     def _read_articles_cache(self):
-        if os.path.exists(self._articles_cache_file):
-            try:
-                with open(self._articles_cache_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except Exception:
-                return None
-        return None
+        return self.articles_cache.leer()
+
+    @mainthread
+    def _update_articles_ui(self):
+        self.indexar_busqueda()
+        try:
+            screen = self.root.get_screen('articulos')
+            screen.articles = self.articles
+            screen.populate_articles()
+        except Exception:
+            pass
 
     def load_articles(self, force_remote=False):
         # Loads articles into self.articles using this priority:
@@ -937,9 +1241,11 @@ class LactaSeguraApp(App):
         if force_remote and remote_url and self.is_online():
             def _bg():
                 try:
-                    new = self.fetch_remote_articles(remote_url)
-                    self.articles = new
-                    self._write_articles_cache(new)
+                    new = self.fetch_remote_articles(remote_url, force=True)
+                    if new is None:
+                        print("Articles not modified on server.")
+                        return
+                    self.articles = self.catalogo.reiniciar(new, remote_url)
                     print("Articles updated from remote.")
                     # Update UI
                     mainthread_update = getattr(self, '_update_articles_ui', None)
@@ -952,19 +1258,24 @@ class LactaSeguraApp(App):
 
         # Try cache first
         cached = self._read_articles_cache()
-        if cached:
-            self.articles = cached
-        else:
+        try:
+            self.articles = self.catalogo.reiniciar(cached, remote_url) if cached else None
+        except ValueError:
+            self.articles = None
+        if not self.articles:
             # fallback to bundled list
-            self.articles = ARTICLES.copy()
+            self.articles = self.catalogo.reiniciar(ARTICLES.copy())
 
         # If not forced but online and remote_url, attempt a background refresh
-        if not force_remote and remote_url and self.is_online():
+        if not force_remote and remote_url and not self.is_online():
+            self._refresco_pendiente = True
+        elif not force_remote and remote_url:
             def _bg2():
                 try:
                     new = self.fetch_remote_articles(remote_url)
-                    self.articles = new
-                    self._write_articles_cache(new)
+                    if new is None:
+                        return  # cache still fresh or 304 Not Modified
+                    self.articles = self.catalogo.reiniciar(new, remote_url)
                     print("Articles refreshed from remote in background.")
                     mainthread_update = getattr(self, '_update_articles_ui', None)
                     if mainthread_update:
@@ -974,6 +1285,7 @@ class LactaSeguraApp(App):
             threading.Thread(target=_bg2, daemon=True).start()
 
         # Finally, push to UI now
+        self.indexar_busqueda()
         try:
             screen = self.root.get_screen('articulos')
             screen.articles = self.articles
@@ -1014,26 +1326,144 @@ class LactaSeguraApp(App):
             if not self.root:
                 print(f"Advertencia: root aún no inicializado, no se puede abrir {name}")
                 return
-            if name in self.root.screen_names:
+            if name in self.pantallas:
+                self.pantalla(name)
                 self.root.current = name
             else:
-                print(f"Pantalla '{name}' no encontrada entre: {self.root.screen_names}")
+                print(f"Pantalla '{name}' no encontrada entre: {list(self.pantallas)}")
         except Exception as e:
             print(f"Error al cambiar a la pantalla {name}: {e}")
 
-    def abrir_resumen(self, title, content, link=None):
+    def cargar_mas_articulos(self):
+        # Next catalogue page in the background; appended to the list on the main thread
+        if not self.catalogo.hay_mas() or not self.is_online():
+            return
+        def _bg():
+            try:
+                nuevos = self.catalogo.cargar_mas()
+                if nuevos:
+                    self._agregar_articulos_ui(nuevos)
+            except Exception as e:
+                print("Failed loading next articles page:", e)
+        threading.Thread(target=_bg, daemon=True).start()
+
+    @mainthread
+    def _agregar_articulos_ui(self, nuevos):
+        self.indexar_busqueda(nuevos)
+        try:
+            self.root.get_screen('articulos').agregar_articulos(nuevos)
+        except Exception:
+            pass
+
+    def _contenido_articulo(self, art, resumen):
+        partes = [art.get("authors", ""), f"Fuente: {art.get('source', '')}", resumen]
+        return "\n\n".join(p for p in partes if p)
+
+    def abrir_articulo(self, indice):
+        # The summary is read from the index item or the disk cache, or downloaded on demand
+        art = self.articles[int(indice)]
+        resumen = self.catalogo.resumen_en_cache(art)
+        if resumen is not None:
+            self.abrir_resumen(art.get("title", ""), self._contenido_articulo(art, resumen), art.get("url"))
+            return
+        self.abrir_resumen(art.get("title", ""), "Cargando resumen...", art.get("url"))
+        def _bg():
+            try:
+                texto = self.catalogo.resumen(art)
+            except Exception as e:
+                print("Failed fetching article summary:", e)
+                texto = "No se pudo cargar el resumen. Verifique su conexión."
+            self._mostrar_resumen(art, self._contenido_articulo(art, texto))
+        threading.Thread(target=_bg, daemon=True).start()
+
+    @mainthread
+    def _mostrar_resumen(self, art, contenido):
+        # The downloaded summary is now in the disk cache: make it searchable
+        self.indexar_busqueda([art])
         resumen = self.root.get_screen("resumen")
+        if resumen.title == art.get("title", ""):
+            resumen.content = contenido
+
+    def exportar(self, tabla, formato, estado):
+        # Background export of `tabla` streamed from SQLite to a timestamped file.
+        # `estado(texto, terminado=False)` receives the progress and final messages.
+        nombre = f"{tabla}_lactasegura_{datetime.now():%Y%m%d_%H%M%S}{FORMATOS[formato]}"
+        path = os.path.join(self.user_data_dir, self.export_dir, nombre)
+        def progreso(escritas, total):
+            estado(f"Exportando... {escritas}/{total}")
+        def al_terminar(resultado, path, escritas, error):
+            if resultado == "ok":
+                estado(f"{escritas} filas exportadas a {path}", terminado=True)
+            elif resultado == "cancelado":
+                estado("Exportación cancelada", terminado=True)
+            else:
+                estado(f"Error al exportar: {error}", terminado=True)
+        return TrabajoExportacion(self.db.path, tabla, path, formato, progreso, al_terminar).iniciar()
+
+    # Offline search over guides and articles
+    @staticmethod
+    def _clave_articulo(art):
+        return str(art.get("id") or art.get("url") or art.get("title", ""))
+
+    def _documento_articulo(self, art):
+        resumen = self.catalogo.resumen_en_cache(art) or ""
+        texto = "\n".join((art.get("authors", ""), art.get("source", ""), resumen))
+        return ("art:" + self._clave_articulo(art), art.get("title", ""), texto)
+
+    def indexar_busqueda(self, articulos=None):
+        # Reindexes in the background and saves the index so the next start only has to load it.
+        # `articulos` are the new or changed articles (a catalogue page, a downloaded summary).
+        # Without it the whole catalogue was replaced: only articles not indexed yet, renamed
+        # or carrying their own summary are read again (a cached summary only changes through
+        # _mostrar_resumen, which passes its article), and the ones no longer listed are dropped.
+        completo = articulos is None
+        articulos = list(self.articles or []) if completo else list(articulos)
+        def _bg():
+            with self._indexando:
+                try:
+                    if not self._buscador_cargado:
+                        self.buscador.cargar()
+                        self.buscador.actualizar(
+                            [("guia:" + nombre, titulo, texto) for nombre, (titulo, texto) in GUIAS.items()],
+                            prefijo="guia:")
+                        self._buscador_cargado = True
+                    if completo:
+                        vigentes = {"art:" + self._clave_articulo(a) for a in articulos}
+                        cambiados = [a for a in articulos if a.get("summary") or
+                                     self.buscador.titulo("art:" + self._clave_articulo(a)) != a.get("title", "")]
+                        self.buscador.actualizar([self._documento_articulo(a) for a in cambiados],
+                                                 prefijo="art:", vigentes=vigentes)
+                    else:
+                        self.buscador.actualizar([self._documento_articulo(a) for a in articulos])
+                    self.buscador.guardar()
+                except Exception as e:
+                    print("Error al actualizar el índice de búsqueda:", e)
+        threading.Thread(target=_bg, daemon=True).start()
+
+    def buscar(self, consulta, limite=50):
+        # Rows for the articles RecycleView: guides open their screen, articles their summary
+        posiciones = {"art:" + self._clave_articulo(a): i for i, a in enumerate(self.articles or [])}
+        filas = []
+        for doc_id, titulo, _ in self.buscador.buscar(consulta, limite):
+            if doc_id.startswith("guia:"):
+                filas.append({"text": titulo, "indice": -1, "destino": doc_id[len("guia:"):]})
+            elif doc_id in posiciones:
+                filas.append({"text": titulo, "indice": posiciones[doc_id], "destino": ""})
+        return filas
+
+    def abrir_resumen(self, title, content, link=None):
+        resumen = self.pantalla("resumen")
         resumen.title = title
         resumen.content = content
         if link:
             resumen.content_link = link
         else:
             resumen.content_link = "https://www.google.com"
-        self.root.current = "resumen"
+        self.abrir_pantalla("resumen")
 
     def abrir_en_navegador(self, url):
         try:
-            webbrowser.open(url)
+            importar("webbrowser").open(url)
         except Exception as e:
             print("No se pudo abrir el navegador:", e)
 
@@ -0,0 +1,102 @@
+# models.py - LactaSegura - Mediciones y registros tipados
+# Sin dependencias de Kivy. Los valores se convierten una sola vez al leerlos
+# de la base (números a float, fechas ISO a segundos epoch); los dicts de texto
+# sólo se usan en el límite con el almacenamiento y la sincronización.
+from datetime import datetime
+from imc import numero
+
+
+def momento(fecha):
+    """Segundos epoch de una fecha ISO, o None si no se puede leer"""
+    try:
+        return datetime.fromisoformat(fecha).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def formatear_numero(valor):
+    """Texto corto de un número para mostrar ("3.5", "50", "" si falta)"""
+    return "" if valor is None else f"{valor:g}"
+
+
+def leer_numero(texto, campo):
+    """float de un número ingresado (None si está vacío); ValueError con el mensaje para el usuario si no lo es"""
+    if texto is None or not str(texto).strip():
+        return None
+    valor = numero(str(texto).strip())
+    if valor is None or valor < 0:
+        raise ValueError(f"{campo} no es un número válido: {texto}")
+    return valor
+
+
+def _texto(valor):
+    # Formato de las columnas de texto de la base ("3.0", "" si falta)
+    return "" if valor is None else str(valor)
+
+
+class Medicion:
+    """Una entrada del historial IMC; `registro_id` es el Registro.id del bebé (vacío si no tiene)"""
+    __slots__ = ("fecha", "momento", "peso_kg", "talla_cm", "edad_meses", "sexo", "imc", "codigo", "registro_id")
+
+    def __init__(self, fecha, peso_kg=None, talla_cm=None, edad_meses=None, sexo="", imc=None, codigo="",
+                 registro_id=""):
+        self.fecha = fecha
+        self.momento = momento(fecha)
+        self.peso_kg = peso_kg
+        self.talla_cm = talla_cm
+        self.edad_meses = edad_meses
+        self.sexo = sexo
+        self.imc = imc
+        self.codigo = codigo
+        self.registro_id = registro_id
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(datos.get("fecha", ""), numero(datos.get("peso_kg")), numero(datos.get("talla_cm")),
+                   numero(datos.get("edad_meses")), datos.get("sexo") or "", numero(datos.get("imc")),
+                   datos.get("codigo") or "", str(datos.get("registro_id") or ""))
+
+    def como_dict(self):
+        return {"fecha": self.fecha, "peso_kg": _texto(self.peso_kg), "talla_cm": _texto(self.talla_cm),
+                "edad_meses": _texto(self.edad_meses), "sexo": self.sexo, "imc": self.imc,
+                "codigo": self.codigo, "registro_id": self.registro_id}
+
+    def fecha_corta(self):
+        if self.momento is None:
+            return self.fecha
+        return datetime.fromtimestamp(self.momento).strftime("%d/%m/%Y %H:%M")
+
+
+class Registro:
+    """Un registro local (bebé) de RegistroLocal"""
+    __slots__ = ("id", "fecha", "momento", "nombre", "edad_meses", "peso_kg", "observacion")
+
+    def __init__(self, id, fecha, nombre="", edad_meses=None, peso_kg=None, observacion=""):
+        self.id = id
+        self.fecha = fecha
+        self.momento = momento(fecha)
+        self.nombre = nombre
+        self.edad_meses = edad_meses
+        self.peso_kg = peso_kg
+        self.observacion = observacion
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(str(datos.get("id", "")), datos.get("fecha", ""), datos.get("nombre") or "",
+                   numero(datos.get("edad_meses")), numero(datos.get("peso_kg")),
+                   datos.get("observacion") or "")
+
+    def actualizar(self, nombre, edad_meses, peso_kg, observacion):
+        """Aplica los valores ingresados; si un número no es válido lanza ValueError sin cambiar nada"""
+        edad_meses = leer_numero(edad_meses, "Edad")
+        peso_kg = leer_numero(peso_kg, "Peso")
+        self.nombre = nombre
+        self.edad_meses = edad_meses
+        self.peso_kg = peso_kg
+        self.observacion = observacion
+
+    def como_dict(self):
+        # Mismo formato al guardar y al editar ("4", no "4.0")
+        return {"id": self.id, "fecha": self.fecha, "nombre": self.nombre,
+                "edad_meses": formatear_numero(self.edad_meses), "peso_kg": formatear_numero(self.peso_kg),
+                "observacion": self.observacion}
@@ -0,0 +1,193 @@
+# record_index.py - LactaSegura - Índice en memoria de los registros locales
+# Sin dependencias de Kivy. Se construye una vez al cargar los registros
+# (models.Registro) y se mantiene al día con agregar/actualizar/eliminar.
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from models import formatear_numero
+
+_SEP_CAMPO = "\x1f"
+_SEP_REGISTRO = "\n"
+_INF = float("inf")
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos, para búsquedas que no distinguen 'José' de 'jose'"""
+    texto = unicodedata.normalize("NFKD", str(texto).lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+class IndiceRegistros:
+    """Consultas de búsqueda, rango de edad y orden sin recorrer ni reparsear los registros.
+
+    - Texto: un corpus normalizado con todos los registros donde se busca con
+      `str.find` (subcadena o prefijo) y se traduce cada posición a su registro.
+    - Edad y peso: columnas numéricas ordenadas, consultadas con `bisect`.
+    - Orden: listas ya ordenadas por fecha, nombre, edad y peso.
+    """
+    criterios = ("fecha", "nombre", "edad", "peso")
+
+    def __init__(self, records=()):
+        self._registros = {}
+        self._texto = {}
+        self._claves = {}
+        self._por_edad = []
+        self._por_peso = []
+        self._por_nombre = []
+        self._por_fecha = []
+        self._corpus = None
+        self._rangos = {}
+        self._ultima_busqueda = None
+        # Carga inicial: ids repetidos primero (gana el último, en la posición del primero),
+        # después las columnas se llenan y se ordenan una sola vez
+        unicos = {}
+        for record in records:
+            unicos[record.id] = record
+        for record in unicos.values():
+            claves = self._preparar(record)
+            for columna, clave in zip(self._columnas(), claves):
+                columna.append(clave)
+        for columna in self._columnas():
+            columna.sort()
+
+    def __len__(self):
+        return len(self._registros)
+
+    # --- Mantenimiento ---
+    def _insertar(self, record):
+        if record.id in self._registros:
+            # Actualización: conserva la posición original del registro
+            self._quitar_claves(record.id)
+        for columna, clave in zip(self._columnas(), self._preparar(record)):
+            insort(columna, clave)
+        self._invalidar()
+
+    def _preparar(self, record):
+        rec_id = record.id
+        nombre = normalizar(record.nombre)
+        edad = record.edad_meses
+        peso = record.peso_kg
+        fecha = record.fecha
+        claves = (
+            (_INF if edad is None else edad, rec_id),
+            (_INF if peso is None else peso, rec_id),
+            (nombre, rec_id),
+            (fecha, rec_id),
+        )
+        self._registros[rec_id] = record
+        self._claves[rec_id] = claves
+        self._texto[rec_id] = _SEP_CAMPO.join((
+            nombre, fecha, formatear_numero(edad), formatear_numero(peso)
+        ))
+        return claves
+
+    def _quitar(self, rec_id):
+        self._quitar_claves(rec_id)
+        del self._registros[rec_id]
+        del self._texto[rec_id]
+
+    def _quitar_claves(self, rec_id):
+        claves = self._claves.pop(rec_id)
+        for columna, clave in zip(self._columnas(), claves):
+            pos = bisect_left(columna, clave)
+            if pos < len(columna) and columna[pos] == clave:
+                del columna[pos]
+        self._invalidar()
+
+    def _columnas(self):
+        return (self._por_edad, self._por_peso, self._por_nombre, self._por_fecha)
+
+    def _invalidar(self):
+        self._corpus = None
+        self._rangos = {}
+        self._ultima_busqueda = None
+
+    def agregar(self, record):
+        self._insertar(record)
+
+    def actualizar(self, record):
+        """Reindexa un registro modificado (mismo id)"""
+        self._insertar(record)
+
+    def eliminar(self, rec_id):
+        if rec_id in self._registros:
+            self._quitar(rec_id)
+
+    # --- Consultas ---
+    def _construir_corpus(self):
+        ids = list(self._registros)
+        inicios = []
+        pos = 0
+        for rec_id in ids:
+            inicios.append(pos)
+            pos += len(self._texto[rec_id]) + 1
+        self._corpus = (_SEP_REGISTRO.join(self._texto[i] for i in ids), inicios, ids)
+
+    def buscar(self, texto):
+        """Ids cuyos campos contienen `texto` (sin distinguir mayúsculas ni acentos)"""
+        consulta = normalizar(texto).strip()
+        if not consulta or _SEP_CAMPO in consulta or _SEP_REGISTRO in consulta:
+            return list(self._registros)
+        previa = self._ultima_busqueda
+        if previa and consulta.startswith(previa[0]):
+            # Al seguir escribiendo sólo se refina el resultado anterior
+            ids = [i for i in previa[1] if consulta in self._texto[i]]
+        else:
+            if self._corpus is None:
+                self._construir_corpus()
+            corpus, inicios, todos = self._corpus
+            if corpus.count(consulta) * 8 > len(todos):
+                # Consulta muy común (p. ej. una sola letra): recorrer los textos es más barato
+                ids = [i for i in todos if consulta in self._texto[i]]
+                self._ultima_busqueda = (consulta, ids)
+                return ids
+            ids = []
+            pos = corpus.find(consulta)
+            while pos != -1:
+                n = bisect_right(inicios, pos) - 1
+                ids.append(todos[n])
+                siguiente = inicios[n + 1] if n + 1 < len(inicios) else len(corpus)
+                pos = corpus.find(consulta, siguiente)
+        self._ultima_busqueda = (consulta, ids)
+        return ids
+
+    def rango(self, campo, minimo=None, maximo=None):
+        """Ids con `campo` ('edad' o 'peso') en [minimo, maximo]"""
+        columna = self._por_edad if campo == "edad" else self._por_peso
+        desde = 0 if minimo is None else bisect_left(columna, (minimo,))
+        hasta = len(columna) if maximo is None else bisect_right(columna, (maximo, "\U0010ffff"))
+        # Los registros sin valor numérico quedan al final (inf) y nunca entran en un rango
+        return [rec_id for valor, rec_id in columna[desde:hasta] if valor != _INF]
+
+    def _orden(self, criterio):
+        if criterio == "edad":
+            return [i for _, i in self._por_edad]
+        if criterio == "peso":
+            return [i for _, i in self._por_peso]
+        if criterio == "nombre":
+            return [i for _, i in self._por_nombre]
+        if criterio == "fecha":
+            return [i for _, i in reversed(self._por_fecha)]
+        return list(self._registros)
+
+    def _rango_de(self, criterio):
+        rangos = self._rangos.get(criterio)
+        if rangos is None:
+            rangos = {rec_id: n for n, rec_id in enumerate(self._orden(criterio))}
+            self._rangos[criterio] = rangos
+        return rangos
+
+    def consultar(self, texto=None, edad_min=None, edad_max=None, criterio=None):
+        """Combina búsqueda, rango de edad y orden; devuelve los registros"""
+        candidatos = None
+        if texto:
+            candidatos = set(self.buscar(texto))
+        if edad_min is not None or edad_max is not None:
+            en_rango = self.rango("edad", edad_min, edad_max)
+            candidatos = set(en_rango) if candidatos is None else candidatos.intersection(en_rango)
+        if candidatos is None:
+            ids = self._orden(criterio)
+        elif len(candidatos) * 8 < len(self._registros):
+            ids = sorted(candidatos, key=self._rango_de(criterio).__getitem__)
+        else:
+            ids = [i for i in self._orden(criterio) if i in candidatos]
+        return [self._registros[i] for i in ids]
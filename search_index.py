@@ -0,0 +1,167 @@
+# search_index.py - LactaSegura - Búsqueda de texto completo sin conexión
+# Sin dependencias de Kivy. Índice invertido con ranking BM25 sobre artículos
+# y guías, persistido en disco y actualizado sólo con los documentos que cambian.
+import os, json, math, re, hashlib, heapq, threading, unicodedata
+
+# Palabras vacías frecuentes en español y portugués
+_VACIAS = frozenset("""
+a al ao aos as com como con da das de del do dos e el em en entre es esta este
+la las lo los mas na nas no nos o os para pela pelo por que se sem sin sobre su
+sus um uma un una uno y ya
+""".split())
+
+_PALABRA = re.compile(r"\w+")
+
+
+def tokenizar(texto):
+    """Términos normalizados: minúsculas, sin acentos, sin palabras vacías y sin plural simple"""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    terminos = []
+    for palabra in _PALABRA.findall(texto):
+        if palabra in _VACIAS or len(palabra) < 2:
+            continue
+        if len(palabra) > 4 and palabra.endswith("s"):
+            palabra = palabra[:-1]
+        terminos.append(palabra)
+    return terminos
+
+
+def _firma(titulo, texto):
+    return hashlib.sha1((titulo + "\x00" + texto).encode("utf-8")).hexdigest()[:16]
+
+
+class IndiceBusqueda:
+    """Índice invertido (término -> {documento: frecuencia}) con ranking BM25.
+
+    `actualizar` sólo reindexa los documentos cuya firma cambió, y `guardar`
+    escribe el índice en JSON para no reconstruirlo al iniciar la app.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, path="lactasegura_search_index.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.docs = {}       # doc_id -> [titulo, largo, firma]
+        self.postings = {}   # termino -> {doc_id: frecuencia}
+        self._terminos = {}  # doc_id -> términos con posting (para quitar sin recorrer el índice)
+        self._total_largo = 0
+        self.modificado = False
+
+    def cargar(self):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+            with self._lock:
+                self.docs = datos["docs"]
+                self.postings = datos["postings"]
+                self._terminos = {}
+                for termino, lista in self.postings.items():
+                    for doc_id in lista:
+                        self._terminos.setdefault(doc_id, []).append(termino)
+                self._total_largo = sum(d[1] for d in self.docs.values())
+                self.modificado = False
+            return True
+        except Exception as e:
+            print("Error al cargar índice de búsqueda:", e)
+            return False
+
+    def guardar(self):
+        with self._lock:
+            if not self.modificado:
+                return
+            datos = json.dumps({"docs": self.docs, "postings": self.postings},
+                               ensure_ascii=False, separators=(",", ":"))
+            self.modificado = False
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(datos)
+        os.replace(tmp, self.path)
+
+    def _quitar(self, doc_id):
+        _, largo, _ = self.docs.pop(doc_id)
+        self._total_largo -= largo
+        for termino in self._terminos.pop(doc_id, ()):
+            lista = self.postings[termino]
+            del lista[doc_id]
+            if not lista:
+                del self.postings[termino]
+
+    def titulo(self, doc_id):
+        """Título indexado de `doc_id`, o None si no está en el índice"""
+        with self._lock:
+            actual = self.docs.get(doc_id)
+            return actual[0] if actual else None
+
+    def actualizar(self, documentos, prefijo=None, vigentes=None):
+        """Indexa [(doc_id, titulo, texto)]; con `prefijo`, borra los de ese tipo que ya no estén.
+
+        `vigentes` (ids) amplía lo que se conserva con `prefijo`: así quien
+        llama puede pasar sólo los documentos nuevos o cambiados sin que se
+        borren los demás. Devuelve la cantidad de documentos (re)indexados.
+        """
+        cambiados = 0
+        with self._lock:
+            vistos = set()
+            for doc_id, titulo, texto in documentos:
+                vistos.add(doc_id)
+                firma = _firma(titulo, texto)
+                actual = self.docs.get(doc_id)
+                if actual and actual[2] == firma:
+                    continue
+                if actual:
+                    self._quitar(doc_id)
+                terminos = tokenizar(titulo) * 2 + tokenizar(texto)  # el título pesa doble
+                frecuencias = {}
+                for termino in terminos:
+                    frecuencias[termino] = frecuencias.get(termino, 0) + 1
+                for termino, tf in frecuencias.items():
+                    self.postings.setdefault(termino, {})[doc_id] = tf
+                self._terminos[doc_id] = list(frecuencias)
+                self.docs[doc_id] = [titulo, len(terminos), firma]
+                self._total_largo += len(terminos)
+                cambiados += 1
+            if prefijo:
+                if vigentes is not None:
+                    vistos.update(vigentes)
+                for doc_id in [d for d in self.docs if d.startswith(prefijo) and d not in vistos]:
+                    self._quitar(doc_id)
+                    cambiados += 1
+            if cambiados:
+                self.modificado = True
+        return cambiados
+
+    def buscar(self, consulta, limite=50):
+        """[(doc_id, titulo, puntaje)] ordenados por relevancia BM25"""
+        terminos = tokenizar(consulta)
+        if not terminos:
+            return []
+        with self._lock:
+            n = len(self.docs)
+            if not n:
+                return []
+            promedio = self._total_largo / n
+            puntajes = {}
+            for termino in set(terminos):
+                lista = self.postings.get(termino)
+                if not lista:
+                    # El último término puede estar incompleto mientras se escribe: buscar por prefijo
+                    if termino != terminos[-1]:
+                        continue
+                    lista = {}
+                    for t, docs in self.postings.items():
+                        if t.startswith(termino):
+                            for doc_id, tf in docs.items():
+                                lista[doc_id] = lista.get(doc_id, 0) + tf
+                    if not lista:
+                        continue
+                idf = math.log(1 + (n - len(lista) + 0.5) / (len(lista) + 0.5))
+                for doc_id, tf in lista.items():
+                    largo = self.docs[doc_id][1]
+                    norma = tf + self.k1 * (1 - self.b + self.b * largo / promedio)
+                    puntajes[doc_id] = puntajes.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norma
+            mejores = heapq.nlargest(limite, puntajes.items(), key=lambda x: x[1])
+            return [(doc_id, self.docs[doc_id][0], puntaje) for doc_id, puntaje in mejores]
@@ -0,0 +1,122 @@
+# startup.py - LactaSegura - Tiempos de arranque e importaciones diferidas
+# Sin dependencias de Kivy: main.py lo importa antes que nada para medir
+# desde el primer momento de la carga del módulo.
+import os, json, time, importlib, threading
+
+
+class InformeArranque:
+    """Marcas de tiempo del arranque, relativas al inicio de la carga de main.py.
+
+    `marcar(etapa)` registra el instante en que termina una etapa y
+    `medir(etapa)` la duración de un bloque. Al mostrarse la pantalla de
+    inicio, `guardar()` añade el informe a un historial en disco para poder
+    comparar arranques y detectar regresiones frente a `presupuesto`.
+    """
+
+    def __init__(self, presupuesto=2.0, historial=20):
+        self.inicio = time.perf_counter()
+        self.presupuesto = presupuesto
+        self.historial = historial
+        self.marcas = []
+        self.duraciones = {}
+        self._lock = threading.Lock()
+
+    def transcurrido(self):
+        return time.perf_counter() - self.inicio
+
+    def marcar(self, etapa):
+        with self._lock:
+            self.marcas.append((etapa, self.transcurrido()))
+
+    def medir(self, etapa):
+        return _Medicion(self, etapa)
+
+    def sumar(self, etapa, segundos):
+        with self._lock:
+            self.duraciones[etapa] = self.duraciones.get(etapa, 0.0) + segundos
+
+    def hasta(self, etapa):
+        for nombre, t in self.marcas:
+            if nombre == etapa:
+                return t
+        return None
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "marcas": {nombre: round(t * 1000, 1) for nombre, t in self.marcas},
+                "duraciones": {nombre: round(s * 1000, 1) for nombre, s in self.duraciones.items()},
+            }
+
+    def texto(self, etapa_objetivo="splash"):
+        lineas = ["Arranque de LactaSegura (ms desde la carga de main.py):"]
+        for nombre, t in self.marcas:
+            lineas.append(f"  {nombre:<24}{t * 1000:9.1f}")
+        if self.duraciones:
+            lineas.append("Duraciones (ms):")
+            for nombre, s in sorted(self.duraciones.items(), key=lambda x: -x[1]):
+                lineas.append(f"  {nombre:<24}{s * 1000:9.1f}")
+        objetivo = self.hasta(etapa_objetivo)
+        if objetivo is not None and objetivo > self.presupuesto:
+            lineas.append(f"AVISO: '{etapa_objetivo}' tardó {objetivo:.2f} s, "
+                          f"por encima del presupuesto de {self.presupuesto:.2f} s")
+        return "\n".join(lineas)
+
+    def guardar(self, path):
+        """Añade este arranque al historial (últimos `historial` arranques) en `path`"""
+        previos = []
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    previos = json.load(f)
+            except Exception:
+                previos = []
+        if not isinstance(previos, list):
+            previos = []
+        previos = (previos + [self.como_dict()])[-self.historial:]
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(previos, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+
+class _Medicion:
+    def __init__(self, informe, etapa):
+        self.informe = informe
+        self.etapa = etapa
+
+    def __enter__(self):
+        self._t = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.informe.sumar(self.etapa, time.perf_counter() - self._t)
+        return False
+
+
+# Informe del proceso actual; main.py lo crea al empezar a cargarse
+arranque = InformeArranque()
+
+_modulos = {}
+_modulos_lock = threading.Lock()
+
+
+def importar(nombre):
+    """Importa `nombre` la primera vez que se usa y lo recuerda; None si no está instalado.
+
+    El tiempo de cada importación queda en el informe de arranque como
+    'import <nombre>', así se ve qué módulo pesado se cargó y cuándo.
+    """
+    with _modulos_lock:
+        if nombre in _modulos:
+            return _modulos[nombre]
+        t = time.perf_counter()
+        try:
+            modulo = importlib.import_module(nombre)
+        except ImportError as e:
+            print(f"Módulo opcional no disponible ({nombre}): {e}")
+            modulo = None
+        arranque.sumar("import " + nombre, time.perf_counter() - t)
+        _modulos[nombre] = modulo
+        return modulo
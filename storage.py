@@ -0,0 +1,735 @@
+# storage.py - LactaSegura - Persistencia del historial IMC
+# Sin dependencias de Kivy para poder usarse desde la app y desde scripts.
+import os, json, threading, time, sqlite3
+from imc import migrar_entrada
+from models import Medicion, Registro
+from array import array
+from columns import COLUMNAS, ColumnasHistorial, fila_columnas, valores_columnas
+
+
+def _escribir_atomico(path, lineas):
+    """Escribe `lineas` (bytes) en un temporal y lo renombra sobre `path`"""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        for linea in lineas:
+            f.write(linea)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _linea(obj):
+    return (json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class HistorialJournal:
+    """Historial IMC en formato JSON Lines (una entrada por línea).
+
+    Guardar un cálculo sólo agrega una línea al final del archivo, así que el
+    costo no crece con el tamaño del historial. Las bajas se anotan como
+    marcas ``{"_borrado": fecha}`` y se eliminan físicamente al compactar.
+    """
+    # Compactar cuando las líneas muertas superen esta fracción del total
+    umbral_compactacion = 0.5
+    minimo_compactacion = 64
+
+    def __init__(self, path, legacy_path=None):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._lock = threading.Lock()
+        self._muertas = 0
+        self._total = 0
+        self._migrar_legacy()
+        self._reparar_cola()
+
+    def _migrar_legacy(self):
+        # Migración única del arreglo JSON original al journal
+        if not self.legacy_path or os.path.exists(self.path):
+            return
+        if not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                historial = json.load(f)
+            if not isinstance(historial, list):
+                historial = []
+            _escribir_atomico(self.path, (_linea(c) for c in historial))
+            os.replace(self.legacy_path, self.legacy_path + ".migrado")
+            print(f"Historial migrado a {self.path} ({len(historial)} entradas)")
+        except Exception as e:
+            print("Error al migrar historial:", e)
+
+    def _reparar_cola(self):
+        # Si la app se cerró a mitad de una escritura, descartar la línea incompleta
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb+") as f:
+                f.seek(0, os.SEEK_END)
+                fin = f.tell()
+                if fin == 0:
+                    return
+                f.seek(fin - 1)
+                if f.read(1) == b"\n":
+                    return
+                pos = fin
+                while pos > 0:
+                    inicio = max(0, pos - 4096)
+                    f.seek(inicio)
+                    bloque = f.read(pos - inicio)
+                    corte = bloque.rfind(b"\n")
+                    if corte != -1:
+                        f.truncate(inicio + corte + 1)
+                        break
+                    pos = inicio
+                else:
+                    f.truncate(0)
+            print("Historial: se descartó una entrada incompleta al final del archivo")
+        except Exception as e:
+            print("Error al reparar historial:", e)
+
+    def _agregar_lineas(self, datos):
+        with open(self.path, "ab") as f:
+            f.write(datos)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def agregar(self, calculo):
+        """Agrega un cálculo al final del historial"""
+        with self._lock:
+            self._agregar_lineas(_linea(calculo))
+            self._total += 1
+
+    def eliminar(self, fechas):
+        """Marca como borradas las entradas con las fechas indicadas"""
+        fechas = list(fechas)
+        if not fechas:
+            return
+        with self._lock:
+            self._agregar_lineas(b"".join(_linea({"_borrado": f}) for f in fechas))
+            self._total += len(fechas)
+            self._muertas += 2 * len(fechas)
+        self.compactar_si_necesario()
+
+    def _leer_sin_lock(self):
+        entradas = []
+        borradas = set()
+        total = invalidas = 0
+        if not os.path.exists(self.path):
+            return entradas, 0
+        with open(self.path, "rb") as f:
+            for raw in f:
+                if not raw.strip():
+                    continue
+                total += 1
+                try:
+                    obj = json.loads(raw)
+                except ValueError:
+                    invalidas += 1
+                    continue
+                if "_borrado" in obj:
+                    borradas.add(obj["_borrado"])
+                else:
+                    entradas.append(obj)
+        if borradas:
+            vivas = [c for c in entradas if c.get("fecha") not in borradas]
+        else:
+            vivas = entradas
+        self._total = total
+        self._muertas = total - len(vivas)
+        return vivas, invalidas
+
+    def leer(self):
+        """Devuelve la lista de entradas vigentes, de la más antigua a la más reciente"""
+        with self._lock:
+            vivas, _ = self._leer_sin_lock()
+        self.compactar_si_necesario()
+        return vivas
+
+    def reemplazar(self, historial):
+        """Reescribe el historial completo (p. ej. al restaurar un respaldo)"""
+        with self._lock:
+            _escribir_atomico(self.path, (_linea(c) for c in historial))
+            self._total = len(historial)
+            self._muertas = 0
+
+    def compactar(self):
+        """Reescribe el archivo dejando sólo las entradas vigentes"""
+        with self._lock:
+            vivas, _ = self._leer_sin_lock()
+            _escribir_atomico(self.path, (_linea(c) for c in vivas))
+            self._total = len(vivas)
+            self._muertas = 0
+        return len(vivas)
+
+    def compactar_si_necesario(self):
+        if self._muertas < self.minimo_compactacion:
+            return False
+        if self._muertas < self.umbral_compactacion * max(self._total, 1):
+            return False
+        try:
+            self.compactar()
+            return True
+        except Exception as e:
+            print("Error al compactar historial:", e)
+            return False
+
+
+class GuardadoDiferido:
+    """Escritor en segundo plano que agrupa ráfagas de cálculos en un solo guardado.
+
+    Cada llamada a `programar` reemplaza la entrada pendiente y reinicia la
+    espera; sólo se escribe la última cuando pasan `espera` segundos sin
+    cambios, o de inmediato con `confirmar`. Con `confirmar(esperar=True)`
+    la llamada vuelve recién cuando la entrada ya está escrita, así la que
+    se programe después no puede reemplazarla.
+    """
+
+    def __init__(self, escribir, espera=1.5, al_guardar=None):
+        self._escribir = escribir
+        self.espera = espera
+        self.al_guardar = al_guardar
+        self._cond = threading.Condition()
+        self._pendiente = None
+        self._escribiendo = False
+        self._limite = 0.0
+        self._cerrado = False
+        self._hilo = threading.Thread(target=self._bucle, name="GuardadoDiferido", daemon=True)
+        self._hilo.start()
+
+    def programar(self, entrada):
+        with self._cond:
+            self._pendiente = entrada
+            self._limite = time.monotonic() + self.espera
+            self._cond.notify_all()
+
+    def confirmar(self, esperar=False, timeout=5):
+        """Fuerza el guardado inmediato de la entrada pendiente, si la hay.
+
+        Con `esperar` bloquea (hasta `timeout` segundos) hasta que esté escrita;
+        devuelve False si se agotó la espera.
+        """
+        with self._cond:
+            self._limite = 0.0
+            self._cond.notify_all()
+            if not esperar:
+                return True
+            limite = time.monotonic() + timeout
+            while self._pendiente is not None or self._escribiendo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._cond.wait(restante)
+            return True
+
+    def hay_pendiente(self):
+        with self._cond:
+            return self._pendiente is not None
+
+    def cerrar(self, timeout=5):
+        with self._cond:
+            self._cerrado = True
+            self._limite = 0.0
+            self._cond.notify_all()
+        self._hilo.join(timeout)
+
+    def _bucle(self):
+        while True:
+            with self._cond:
+                # Avisar a quien espera en confirmar(esperar=True) que lo anterior ya se escribió
+                self._escribiendo = False
+                self._cond.notify_all()
+                while self._pendiente is None and not self._cerrado:
+                    self._cond.wait()
+                if self._pendiente is None:
+                    return
+                restante = self._limite - time.monotonic()
+                if restante > 0:
+                    self._cond.wait(restante)
+                    continue
+                entrada, self._pendiente = self._pendiente, None
+                self._escribiendo = True
+            try:
+                self._escribir(entrada)
+                if self.al_guardar:
+                    self.al_guardar(entrada)
+            except Exception as e:
+                print("Error en guardado diferido:", e)
+
+
+_CAMPOS_REGISTRO = ("fecha", "nombre", "edad_meses", "peso_kg", "observacion")
+# La interpretación no se guarda: se arma al mostrarla a partir del código (imc.TEXTOS)
+# `registro_id`: id del registro (bebé) al que pertenece la medición; "" si no tiene
+_CAMPOS_HISTORIAL = ("fecha", "peso_kg", "talla_cm", "edad_meses", "sexo", "imc", "codigo", "registro_id")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS registros (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha TEXT NOT NULL,
+    nombre TEXT NOT NULL DEFAULT '',
+    edad_meses TEXT NOT NULL DEFAULT '',
+    peso_kg TEXT NOT NULL DEFAULT '',
+    observacion TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_registros_nombre ON registros(nombre COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_registros_fecha ON registros(fecha);
+CREATE INDEX IF NOT EXISTS idx_registros_edad ON registros(CAST(edad_meses AS REAL));
+CREATE TABLE IF NOT EXISTS historial (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha TEXT NOT NULL,
+    peso_kg TEXT NOT NULL DEFAULT '',
+    talla_cm TEXT NOT NULL DEFAULT '',
+    edad_meses TEXT NOT NULL DEFAULT '',
+    sexo TEXT NOT NULL DEFAULT '',
+    imc REAL,
+    codigo TEXT NOT NULL DEFAULT '',
+    registro_id TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_historial_fecha ON historial(fecha);
+"""
+
+# Seguimiento de cambios para la sincronización incremental: cada alta o
+# modificación recibe un número de versión creciente y cada baja deja una
+# marca en `borrados`. Se mantiene con triggers para cubrir cualquier escritura.
+# `contadores` cuenta los cambios de cada tabla: sólo crece (purgar `borrados`
+# no lo baja), así que sirve para saber si una copia derivada está al día.
+# Arranca en cambios_seq + 1, mayor que cualquier versión guardada antes de él.
+_ESQUEMA_CAMBIOS = """
+CREATE TABLE IF NOT EXISTS cambios_seq (valor INTEGER NOT NULL);
+INSERT INTO cambios_seq SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM cambios_seq);
+CREATE TABLE IF NOT EXISTS borrados (
+    tabla TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    modificado TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_borrados_version ON borrados(version);
+CREATE INDEX IF NOT EXISTS idx_registros_version ON registros(version);
+CREATE INDEX IF NOT EXISTS idx_historial_version ON historial(version);
+CREATE TRIGGER IF NOT EXISTS registros_ai AFTER INSERT ON registros BEGIN
+    UPDATE cambios_seq SET valor = valor + 1;
+    UPDATE registros SET version = (SELECT valor FROM cambios_seq),
+        modificado = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS registros_au AFTER UPDATE OF fecha, nombre, edad_meses, peso_kg, observacion ON registros BEGIN
+    UPDATE cambios_seq SET valor = valor + 1;
+    UPDATE registros SET version = (SELECT valor FROM cambios_seq),
+        modificado = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS registros_ad AFTER DELETE ON registros BEGIN
+    UPDATE cambios_seq SET valor = valor + 1;
+    INSERT INTO borrados VALUES ('registros', OLD.id, (SELECT valor FROM cambios_seq),
+        strftime('%Y-%m-%dT%H:%M:%f', 'now'));
+END;
+CREATE TRIGGER IF NOT EXISTS historial_ai AFTER INSERT ON historial BEGIN
+    UPDATE cambios_seq SET valor = valor + 1;
+    UPDATE historial SET version = (SELECT valor FROM cambios_seq),
+        modificado = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS historial_ad AFTER DELETE ON historial BEGIN
+    UPDATE cambios_seq SET valor = valor + 1;
+    INSERT INTO borrados VALUES ('historial', OLD.fecha, (SELECT valor FROM cambios_seq),
+        strftime('%Y-%m-%dT%H:%M:%f', 'now'));
+END;
+CREATE TABLE IF NOT EXISTS contadores (tabla TEXT PRIMARY KEY, valor INTEGER NOT NULL);
+INSERT OR IGNORE INTO contadores SELECT 'historial', valor + 1 FROM cambios_seq;
+INSERT OR IGNORE INTO contadores SELECT 'registros', valor + 1 FROM cambios_seq;
+CREATE TRIGGER IF NOT EXISTS registros_cont_ai AFTER INSERT ON registros BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE tabla = 'registros';
+END;
+CREATE TRIGGER IF NOT EXISTS registros_cont_au
+AFTER UPDATE OF fecha, nombre, edad_meses, peso_kg, observacion ON registros BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE tabla = 'registros';
+END;
+CREATE TRIGGER IF NOT EXISTS registros_cont_ad AFTER DELETE ON registros BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE tabla = 'registros';
+END;
+CREATE TRIGGER IF NOT EXISTS historial_cont_ai AFTER INSERT ON historial BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE tabla = 'historial';
+END;
+CREATE TRIGGER IF NOT EXISTS historial_cont_au
+AFTER UPDATE OF fecha, peso_kg, talla_cm, edad_meses, imc ON historial BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE tabla = 'historial';
+END;
+CREATE TRIGGER IF NOT EXISTS historial_cont_ad AFTER DELETE ON historial BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE tabla = 'historial';
+END;
+"""
+
+# Última migración de datos aplicada (PRAGMA user_version); 1: interpretaciones a código
+_VERSION_DATOS = 1
+
+
+class BaseDatos:
+    """Base SQLite (modo WAL) con los registros locales y el historial IMC.
+
+    Una sola conexión compartida entre hilos y protegida por un lock; los
+    repositorios `registros` e `historial` son la API que usa la app.
+    """
+
+    def __init__(self, path="lactasegura.db", columnas_path=None):
+        self.path = path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_ESQUEMA)
+        self._migrar_esquema()
+        self.conn.executescript(_ESQUEMA_CAMBIOS)
+        self._migrar_datos()
+        # Generación de cada tabla: la incrementa el repositorio en cada escritura
+        self.generaciones = {"registros": 0, "historial": 0}
+        self.registros = RepositorioRegistros(self)
+        self.historial = RepositorioHistorial(self)
+        if columnas_path:
+            self.historial.columnas = ColumnasHistorial(columnas_path)
+
+    def _migrar_esquema(self):
+        # Bases creadas antes del seguimiento de cambios: agregar las columnas que falten
+        for tabla in ("registros", "historial"):
+            columnas = {fila[1] for fila in self.conn.execute(f"PRAGMA table_info({tabla})")}
+            if "version" not in columnas:
+                self.conn.execute(f"ALTER TABLE {tabla} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            if "modificado" not in columnas:
+                self.conn.execute(f"ALTER TABLE {tabla} ADD COLUMN modificado TEXT NOT NULL DEFAULT ''")
+        columnas = {fila[1] for fila in self.conn.execute("PRAGMA table_info(historial)")}
+        for columna in ("sexo", "codigo", "registro_id"):
+            if columna not in columnas:
+                self.conn.execute(f"ALTER TABLE historial ADD COLUMN {columna} TEXT NOT NULL DEFAULT ''")
+        # Curva de un bebé: sólo sus filas, ya en orden de fecha
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_historial_registro ON historial(registro_id, fecha)")
+        self.conn.commit()
+
+    def _migrar_datos(self):
+        # Migraciones que recorren filas: se hacen una sola vez y quedan anotadas en
+        # PRAGMA user_version, así los arranques siguientes no vuelven a leer la tabla
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] >= _VERSION_DATOS:
+            return
+        columnas = {fila[1] for fila in self.conn.execute("PRAGMA table_info(historial)")}
+        if "interpretacion" in columnas:
+            self._migrar_interpretaciones()
+        self.conn.execute(f"PRAGMA user_version = {_VERSION_DATOS}")
+
+    def _migrar_interpretaciones(self):
+        # Historial anterior: la interpretación completa por entrada pasa a ser un código.
+        # Las filas convertidas reciben una versión nueva para que la sincronización las envíe
+        cambios = []
+        for rec_id, peso, talla, edad, texto in self.conn.execute(
+                "SELECT id, peso_kg, talla_cm, edad_meses, interpretacion FROM historial "
+                "WHERE interpretacion != ''"):
+            entrada = migrar_entrada({"peso_kg": peso, "talla_cm": talla, "edad_meses": edad,
+                                      "interpretacion": texto})
+            cambios.append((entrada["codigo"], rec_id))
+        if not cambios:
+            return
+        with self.conn:
+            self.conn.execute("UPDATE cambios_seq SET valor = valor + 1")
+            self.conn.executemany(
+                "UPDATE historial SET codigo = ?, interpretacion = '', version = (SELECT valor FROM cambios_seq), "
+                "modificado = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE id = ?", cambios)
+        self.conn.execute("VACUUM")
+        print(f"Historial: {len(cambios)} interpretaciones convertidas a código")
+
+    def tocar(self, tabla):
+        with self._lock:
+            self.generaciones[tabla] += 1
+
+    def contador(self, tabla):
+        """Cambios acumulados de `tabla` desde cualquier conexión (ver `contadores`)"""
+        return self.consultar("SELECT valor FROM contadores WHERE tabla = ?", (tabla,))[0][0]
+
+    def version_actual(self):
+        return self.consultar("SELECT valor FROM cambios_seq")[0][0]
+
+    def cambios_desde(self, cursor):
+        """Altas, modificaciones y bajas con versión posterior a `cursor`, ordenadas por versión"""
+        cambios = []
+        with self._lock:
+            for tabla, repo in (("registros", self.registros), ("historial", self.historial)):
+                columnas = ", ".join(repo.campos)
+                for fila in self.conn.execute(
+                        f"SELECT id, {columnas}, version, modificado FROM {tabla} WHERE version > ?", (cursor,)):
+                    datos = repo._dict(fila)
+                    version = datos.pop("version")
+                    cambios.append({"tabla": tabla, "op": "upsert", "version": version,
+                                    "modificado": datos.pop("modificado"), "datos": datos})
+            for tabla, clave, version, modificado in self.conn.execute(
+                    "SELECT tabla, clave, version, modificado FROM borrados WHERE version > ?", (cursor,)):
+                cambios.append({"tabla": tabla, "op": "delete", "version": version,
+                                "modificado": modificado, "clave": clave})
+        cambios.sort(key=lambda c: c["version"])
+        return cambios
+
+    def purgar_borrados(self, hasta):
+        """Descarta las marcas de baja ya sincronizadas"""
+        self.ejecutar("DELETE FROM borrados WHERE version <= ?", (hasta,))
+
+    def ejecutar(self, sql, parametros=()):
+        with self._lock, self.conn:
+            return self.conn.execute(sql, parametros)
+
+    def consultar(self, sql, parametros=()):
+        with self._lock:
+            return self.conn.execute(sql, parametros).fetchall()
+
+    def cerrar(self):
+        with self._lock:
+            self.conn.close()
+
+
+class _Repositorio:
+    tabla = ""
+    campos = ()
+    modelo = None
+
+    def __init__(self, db):
+        self.db = db
+
+    def _dict(self, fila):
+        datos = dict(fila)
+        datos["id"] = str(datos["id"])
+        return datos
+
+    def _insertar_varios(self, filas):
+        # Conserva los ids numéricos únicos; los demás (repetidos o no numéricos) reciben uno nuevo
+        self.db.tocar(self.tabla)
+        columnas = ", ".join(self.campos)
+        marcas = ", ".join("?" for _ in self.campos)
+        usados = set()
+        for datos in filas:
+            valores = [datos.get(c, "") for c in self.campos]
+            try:
+                rec_id = int(datos.get("id"))
+            except (TypeError, ValueError):
+                rec_id = None
+            if rec_id is not None and rec_id not in usados:
+                usados.add(rec_id)
+                self.db.conn.execute(
+                    f"INSERT INTO {self.tabla} (id, {columnas}) VALUES (?, {marcas})", [rec_id] + valores)
+            else:
+                self.db.conn.execute(f"INSERT INTO {self.tabla} ({columnas}) VALUES ({marcas})", valores)
+
+    def todos(self):
+        filas = self.db.consultar(f"SELECT id, {', '.join(self.campos)} FROM {self.tabla} ORDER BY id")
+        return [self._dict(f) for f in filas]
+
+    def modelos(self):
+        """Todas las filas como objetos tipados (models.py), convertidos una sola vez"""
+        desde_dict = self.modelo.desde_dict
+        return [desde_dict(d) for d in self.todos()]
+
+    def contar(self):
+        return self.db.consultar(f"SELECT COUNT(*) FROM {self.tabla}")[0][0]
+
+    def reemplazar(self, filas):
+        """Reemplaza todo el contenido de la tabla (p. ej. al restaurar un respaldo)"""
+        with self.db._lock, self.db.conn:
+            self.db.conn.execute(f"DELETE FROM {self.tabla}")
+            self._insertar_varios(filas)
+
+
+class RepositorioRegistros(_Repositorio):
+    tabla = "registros"
+    campos = _CAMPOS_REGISTRO
+    modelo = Registro
+
+    def agregar(self, datos):
+        """Inserta un registro y lo devuelve con su id definitivo (autoincremental)"""
+        valores = [datos.get(c, "") for c in self.campos]
+        cur = self.db.ejecutar(
+            f"INSERT INTO registros ({', '.join(self.campos)}) VALUES ({', '.join('?' for _ in self.campos)})",
+            valores)
+        self.db.tocar(self.tabla)
+        record = {c: v for c, v in zip(self.campos, valores)}
+        record["id"] = str(cur.lastrowid)
+        return record
+
+    def actualizar(self, record):
+        asignaciones = ", ".join(f"{c} = ?" for c in self.campos if c != "fecha")
+        valores = [record.get(c, "") for c in self.campos if c != "fecha"]
+        self.db.ejecutar(f"UPDATE registros SET {asignaciones} WHERE id = ?", valores + [int(record["id"])])
+        self.db.tocar(self.tabla)
+
+    def eliminar(self, rec_id):
+        self.db.ejecutar("DELETE FROM registros WHERE id = ?", (int(rec_id),))
+        self.db.tocar(self.tabla)
+
+
+class RepositorioHistorial(_Repositorio):
+    """Misma interfaz que HistorialJournal (agregar/leer/eliminar/reemplazar/compactar).
+
+    Con `columnas` (ColumnasHistorial) mantiene además el archivo de columnas
+    numéricas: cada alta agrega su fila y cualquier otro cambio lo reconstruye.
+    """
+    tabla = "historial"
+    campos = _CAMPOS_HISTORIAL
+    modelo = Medicion
+    columnas = None
+
+    def _dict(self, fila):
+        # El historial no expone el id interno, igual que el formato JSON original
+        datos = dict(fila)
+        datos.pop("id", None)
+        return datos
+
+    def _insertar_varios(self, filas):
+        super()._insertar_varios(migrar_entrada(f) for f in filas)
+
+    def agregar(self, calculo):
+        calculo = migrar_entrada(calculo)
+        self.db.ejecutar(
+            f"INSERT INTO historial ({', '.join(self.campos)}) VALUES ({', '.join('?' for _ in self.campos)})",
+            [calculo.get(c, "") for c in self.campos])
+        self.db.tocar(self.tabla)
+        self.sincronizar_columnas(calculo)
+
+    def reemplazar(self, filas):
+        super().reemplazar(filas)
+        self.sincronizar_columnas()
+
+    def sincronizar_columnas(self, agregado=None):
+        """Pone al día el archivo de columnas: agrega `agregado` si es lo único nuevo o lo reconstruye"""
+        if self.columnas is None:
+            return
+        try:
+            cab = self.columnas.cabecera()
+            with self.db._lock:
+                version = self.db.contador("historial")
+                if cab and cab["version"] == version:
+                    return
+                # Se agrega en su lugar sólo si lo único que cambió desde la cabecera es esta alta
+                if (agregado is not None and cab and cab["version"] == version - 1
+                        and self.columnas.agregar(fila_columnas(agregado), version)):
+                    return
+                columnas = tuple(array("d") for _ in COLUMNAS)
+                for fila in self.db.conn.execute(
+                        "SELECT fecha, peso_kg, talla_cm, edad_meses, imc FROM historial ORDER BY id"):
+                    for columna, valor in zip(columnas, valores_columnas(*fila)):
+                        columna.append(valor)
+                self.columnas.reconstruir(columnas, version)
+        except Exception as e:
+            print("Error al actualizar las columnas del historial:", e)
+
+    def abrir_columnas(self):
+        """LectorColumnas al día con la tabla, o None si no hay archivo de columnas"""
+        if self.columnas is None:
+            return None
+        self.sincronizar_columnas()
+        try:
+            return self.columnas.abrir()
+        except Exception as e:
+            print("Error al abrir las columnas del historial:", e)
+            return None
+
+    def leer(self):
+        return self.todos()
+
+    def de_registro(self, registro_id):
+        """Mediciones de un bebé en orden de fecha; el costo depende sólo de sus filas (índice)"""
+        filas = self.db.consultar(
+            f"SELECT {', '.join(self.campos)} FROM historial WHERE registro_id = ? ORDER BY fecha, id",
+            (str(registro_id),))
+        return [Medicion.desde_dict(dict(f)) for f in filas]
+
+    def eliminar(self, fechas):
+        with self.db._lock, self.db.conn:
+            self.db.conn.executemany("DELETE FROM historial WHERE fecha = ?", [(f,) for f in fechas])
+        self.db.tocar(self.tabla)
+        self.sincronizar_columnas()
+
+    def compactar(self):
+        with self.db._lock:
+            self.db.conn.execute("VACUUM")
+        return self.contar()
+
+
+class CacheDatos:
+    """Historial y registros leídos una sola vez por cambio y compartidos por toda la app.
+
+    Se guardan como objetos tipados (Medicion, Registro): los números y las
+    fechas se convierten al leer la tabla, no en cada consulta. Cada lectura
+    compara la generación guardada con la de la tabla: la de `BaseDatos`,
+    que los repositorios incrementan al escribir, junto con el contador de
+    cambios de la base (`BaseDatos.contador`), que también cuenta lo escrito
+    desde otras conexiones (p. ej. compaction.py ejecutado aparte). Así el
+    caché nunca devuelve datos viejos. Las listas devueltas son compartidas:
+    quien necesite modificarlas debe copiarlas.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._datos = {}  # tabla -> (generación, {clave: datos})
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _obtener(self, tabla, leer, clave=None):
+        generacion = (self.db.generaciones[tabla], self.db.contador(tabla))
+        with self._lock:
+            guardado = self._datos.get(tabla)
+            if guardado and guardado[0] == generacion and clave in guardado[1]:
+                self.aciertos += 1
+                return guardado[1][clave]
+            self.fallos += 1
+        # Si alguien escribe durante la lectura, la generación ya cambió y la próxima lectura falla
+        datos = leer()
+        with self._lock:
+            guardado = self._datos.get(tabla)
+            if not guardado or guardado[0] != generacion:
+                # Generación nueva: se descartan también las vistas por bebé de la anterior
+                guardado = self._datos[tabla] = (generacion, {})
+            guardado[1][clave] = datos
+        return datos
+
+    def historial(self):
+        return self._obtener("historial", self.db.historial.modelos)
+
+    def historial_de(self, registro_id):
+        """Mediciones de un solo bebé, leídas por índice y con el mismo caché que el resto"""
+        return self._obtener("historial", lambda: self.db.historial.de_registro(registro_id), registro_id)
+
+    def registros(self):
+        return self._obtener("registros", self.db.registros.modelos)
+
+    def invalidar(self, tabla=None):
+        with self._lock:
+            if tabla:
+                self._datos.pop(tabla, None)
+            else:
+                self._datos.clear()
+
+    def estadisticas(self):
+        total = self.aciertos + self.fallos
+        return {"aciertos": self.aciertos, "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / total if total else 0.0}
+
+
+def importar_json(db, records_file, journal_file, legacy_history_file=None):
+    """Importa una sola vez los archivos JSON anteriores a la base SQLite.
+
+    Cada archivo importado se renombra con el sufijo ``.importado`` para no
+    volver a leerlo en el siguiente arranque.
+    """
+    if os.path.exists(records_file):
+        try:
+            with open(records_file, "r", encoding="utf-8") as f:
+                registros = json.load(f)
+            if isinstance(registros, list) and registros and db.registros.contar() == 0:
+                with db._lock, db.conn:
+                    db.registros._insertar_varios(registros)
+                print(f"Importados {len(registros)} registros a {db.path}")
+            os.replace(records_file, records_file + ".importado")
+        except Exception as e:
+            print("Error al importar registros:", e)
+    if os.path.exists(journal_file) or (legacy_history_file and os.path.exists(legacy_history_file)):
+        try:
+            # El journal también migra el arreglo JSON original si todavía existe
+            historial = HistorialJournal(journal_file, legacy_path=legacy_history_file).leer()
+            if historial and db.historial.contar() == 0:
+                with db._lock, db.conn:
+                    db.historial._insertar_varios(historial)
+                print(f"Importadas {len(historial)} entradas de historial a {db.path}")
+            os.replace(journal_file, journal_file + ".importado")
+        except Exception as e:
+            print("Error al importar historial:", e)
@@ -0,0 +1,178 @@
+# sync.py - LactaSegura - Sincronización incremental con la nube
+# Sin dependencias de Kivy. CloudSync (main.py) arma los lotes con
+# BaseDatos.cambios_desde() y los envía con uno de estos transportes.
+import os, json, gzip, queue, random, threading
+
+from startup import importar  # requests se importa al primer uso de la red
+
+
+def dividir_en_lotes(cambios, tam_lote=500):
+    """Parte la lista de cambios (ya ordenada por versión) en lotes de `tam_lote`"""
+    for inicio in range(0, len(cambios), tam_lote):
+        yield cambios[inicio:inicio + tam_lote]
+
+
+def comprimir_lote(lote, desde):
+    """Serializa un lote como JSON comprimido con gzip"""
+    cuerpo = {"desde": desde, "hasta": lote[-1]["version"], "cambios": lote}
+    return gzip.compress(json.dumps(cuerpo, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def descomprimir_lote(datos):
+    return json.loads(gzip.decompress(datos).decode("utf-8"))
+
+
+def aplicar_delta(respaldo, cambios):
+    """Aplica una lista de cambios a un respaldo completo {"records": [...], "imc_history": [...]}
+
+    Es lo que hace el servidor con cada lote recibido; TransporteLocal lo usa
+    para simular la nube sobre backup.json.
+    """
+    registros = {r["id"]: r for r in respaldo.get("records") or []}
+    historial = {h["fecha"]: h for h in respaldo.get("imc_history") or []}
+    for cambio in cambios:
+        destino, clave = (registros, "id") if cambio["tabla"] == "registros" else (historial, "fecha")
+        if cambio["op"] == "delete":
+            destino.pop(cambio["clave"], None)
+        else:
+            destino[cambio["datos"][clave]] = cambio["datos"]
+    return {"records": list(registros.values()), "imc_history": list(historial.values())}
+
+
+class TransporteLocal:
+    """Simula la nube en un archivo local (backup.json), aplicando cada lote recibido"""
+
+    def __init__(self, path="backup.json"):
+        self.path = path
+
+    def descargar(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def enviar(self, datos):
+        lote = descomprimir_lote(datos)
+        respaldo = aplicar_delta(self.descargar() or {}, lote["cambios"])
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(respaldo, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+class TransporteHttp:
+    """Envía los lotes con POST (gzip) a `url` y descarga el respaldo completo con GET"""
+
+    def __init__(self, url, token=None, timeout=15):
+        requests = importar("requests")
+        if requests is None:
+            raise RuntimeError("requests package not available")
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _headers(self):
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    def enviar(self, datos):
+        resp = self.session.post(self.url, data=datos, headers=self._headers(), timeout=self.timeout)
+        resp.raise_for_status()
+
+    def descargar(self):
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        resp = self.session.get(self.url, headers=headers, timeout=self.timeout)
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        return resp.json()
+
+
+class TrabajadorSync:
+    """Hilo que drena los cambios pendientes y ejecuta las tareas de sincronización.
+
+    La cola de salida persistente es el registro de versiones de la base: todo
+    cambio posterior al cursor de CloudSync sigue pendiente aunque la app se
+    cierre. Cuando hay conexión y `hay_pendientes()` es verdadero se llama a
+    `sincronizar()`; si falla, se reintenta con espera exponencial y jitter.
+    Las tareas encargadas desde la UI (sincronizar, restaurar, iniciar sesión)
+    se ejecutan en este mismo hilo, así nunca corren dos a la vez.
+    """
+
+    def __init__(self, sincronizar, hay_pendientes, intervalo=60, espera_base=5, espera_maxima=600):
+        self.sincronizar = sincronizar
+        self.hay_pendientes = hay_pendientes
+        self.intervalo = intervalo
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.online = False
+        self.intentos = 0
+        self._espera = intervalo
+        self._tareas = queue.Queue()
+        self._detener = False
+        self._hilo = None
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener = False
+        self._hilo = threading.Thread(target=self._bucle, name="TrabajadorSync", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout=None):
+        self._detener = True
+        self._tareas.put(None)
+        if self._hilo:
+            self._hilo.join(timeout)
+
+    def encargar(self, tarea, al_terminar=None):
+        """Ejecuta `tarea()` en el hilo del trabajador; `al_terminar(resultado)` al finalizar"""
+        self._tareas.put((tarea, al_terminar))
+
+    def conexion_cambiada(self, online):
+        self.online = online
+        if online:
+            # Volvió la conexión: drenar ya, sin esperar el reintento pendiente
+            self.intentos = 0
+            self._tareas.put(None)
+
+    def _siguiente_espera(self, exito):
+        if exito:
+            self.intentos = 0
+            return self.intervalo
+        self.intentos += 1
+        espera = min(self.espera_maxima, self.espera_base * (2 ** self.intentos))
+        return espera * random.uniform(0.5, 1.0)
+
+    def _drenar(self):
+        try:
+            if not self.online or not self.hay_pendientes():
+                return
+            exito = self.sincronizar()
+        except Exception as e:
+            print("Error en sincronización en segundo plano:", e)
+            exito = False
+        self._espera = self._siguiente_espera(exito)
+
+    def _bucle(self):
+        while not self._detener:
+            try:
+                item = self._tareas.get(timeout=self._espera)
+            except queue.Empty:
+                item = None
+            if self._detener:
+                break
+            if item is not None:
+                tarea, al_terminar = item
+                try:
+                    resultado = tarea()
+                except Exception as e:
+                    print("Error en tarea de sincronización:", e)
+                    resultado = None
+                if al_terminar:
+                    al_terminar(resultado)
+                continue
+            self._drenar()
@@ -0,0 +1,4 @@
+# conftest.py - LactaSegura - Los módulos de la app están en la raíz del repositorio
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,47 @@
+# test_calculadora.py - LactaSegura - Calculadora IMC al cambiar de bebé
+import os
+
+import pytest
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+pytest.importorskip("kivy")
+
+from kivy.app import App  # noqa: E402
+
+import main  # noqa: E402
+from growth import MotorCrecimiento  # noqa: E402
+from storage import GuardadoDiferido  # noqa: E402
+
+
+class AppPrueba(App):
+    """Sólo lo que usa CalculadoraIMC: el escritor diferido y el motor OMS (sin tablas)"""
+
+    def __init__(self, directorio):
+        super().__init__()
+        self.escritas = []
+        self.guardado_historial = GuardadoDiferido(self.escritas.append, espera=60)
+        self.crecimiento = MotorCrecimiento(directorio)
+
+
+def test_cambiar_de_bebe_guarda_la_pendiente_para_el_anterior(tmp_path):
+    app = AppPrueba(str(tmp_path))
+    try:
+        calculadora = main.CalculadoraIMC()
+        calculadora.seleccionar_bebe("Ana (#1)")
+        calculadora.peso, calculadora.talla, calculadora.edad = "4.0", "55.0", "2"
+        assert len(app.escritas) == 0  # pendiente: la espera es larga
+
+        calculadora.seleccionar_bebe("Bruno (#2)")
+        # La medición de Ana se escribió antes de cambiar, y Bruno no recibe una copia
+        assert [e["registro_id"] for e in app.escritas] == ["1"]
+        assert app.escritas[0]["peso_kg"] == "4.0"
+        assert calculadora.resultado
+        assert not app.guardado_historial.hay_pendiente()
+
+        # Un valor nuevo sí es una medición de Bruno
+        calculadora.peso = "4.5"
+        app.guardado_historial.cerrar()
+        assert [e["registro_id"] for e in app.escritas] == ["1", "2"]
+    finally:
+        app.guardado_historial.cerrar()
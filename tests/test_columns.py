@@ -0,0 +1,50 @@
+# test_columns.py - LactaSegura - Archivo de columnas del historial
+from compaction import compactar_base
+from storage import BaseDatos
+
+
+def _medicion(fecha, peso):
+    return {"fecha": fecha, "peso_kg": str(peso), "talla_cm": "50", "edad_meses": "1",
+            "sexo": "", "imc": round(peso / 0.25, 2), "codigo": "normal", "registro_id": "1"}
+
+
+def _abrir(tmp_path):
+    return BaseDatos(str(tmp_path / "lactasegura.db"), columnas_path=str(tmp_path / "historial.cols"))
+
+
+def test_alta_se_agrega_sin_reconstruir(tmp_path):
+    db = _abrir(tmp_path)
+    try:
+        db.historial.agregar(_medicion("2024-01-01T10:00:00", 3.5))
+        serie = db.historial.columnas.cabecera()["serie"]
+        db.historial.agregar(_medicion("2024-02-01T10:00:00", 4.0))
+        cab = db.historial.columnas.cabecera()
+        assert cab["serie"] == serie
+        assert cab["filas"] == 2
+        assert cab["version"] == db.contador("historial")
+    finally:
+        db.cerrar()
+
+
+def test_compactar_purgar_y_reabrir(tmp_path):
+    db = _abrir(tmp_path)
+    try:
+        # Una ráfaga de cinco cálculos y una medición aparte
+        for segundo, peso in enumerate((3.1, 3.2, 3.3, 3.4, 3.5)):
+            db.historial.agregar(_medicion(f"2024-01-01T10:00:0{segundo}", peso))
+        db.historial.agregar(_medicion("2024-03-01T10:00:00", 5.0))
+        with db.historial.abrir_columnas() as lector:
+            assert lector.filas == 6
+        informe = compactar_base(db)
+        assert informe.eliminadas == 4
+        db.purgar_borrados(db.version_actual())
+    finally:
+        db.cerrar()
+
+    db = _abrir(tmp_path)
+    try:
+        with db.historial.abrir_columnas() as lector:
+            assert lector.filas == db.historial.contar() == 2
+            assert list(lector.columna("peso_kg")) == [3.5, 5.0]
+    finally:
+        db.cerrar()
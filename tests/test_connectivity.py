@@ -0,0 +1,41 @@
+# test_connectivity.py - LactaSegura - Monitor de conexión
+import time
+
+from connectivity import MonitorConexion
+
+
+class MonitorFalso(MonitorConexion):
+    """Monitor sin red: anota cada comprobación y responde `respuesta`"""
+
+    def __init__(self, respuesta=False, **kwargs):
+        super().__init__(**kwargs)
+        self.respuesta = respuesta
+        self.pruebas = []
+
+    def _probar(self):
+        self.pruebas.append(time.monotonic())
+        return self.respuesta
+
+
+def test_is_online_no_pide_comprobaciones():
+    monitor = MonitorFalso(respuesta=True)
+    monitor.ultima_comprobacion = 0.0  # estado muy viejo
+    for _ in range(100):
+        assert monitor.is_online() is False
+    assert not monitor._evento.is_set()
+    assert monitor.pruebas == []
+
+
+def test_espera_sin_conexion_se_respeta():
+    monitor = MonitorFalso(respuesta=False, intervalo=0.02, espera_maxima=0.16)
+    monitor.iniciar()
+    try:
+        limite = time.monotonic() + 0.5
+        while time.monotonic() < limite:
+            assert monitor.is_online() is False
+    finally:
+        monitor.detener(timeout=1)
+    # Comprobaciones a 0, 0.04, 0.12, 0.28 y 0.44 s: la espera se duplica hasta el máximo
+    assert 2 <= len(monitor.pruebas) <= 6
+    esperas = [b - a for a, b in zip(monitor.pruebas, monitor.pruebas[1:])]
+    assert all(e >= 0.03 for e in esperas)
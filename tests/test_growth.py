@@ -0,0 +1,71 @@
+# test_growth.py - LactaSegura - Patrones de crecimiento OMS (método LMS)
+import pytest
+
+from growth import MotorCrecimiento, percentil
+
+# Filas de WHO Anthro (peso para la edad y IMC para la edad) al nacer; sexo 1 = niño, 2 = niña.
+# La fila de 30 días de peso es inventada: sólo sirve para probar la interpolación.
+_PESO = """sex\tage\tl\tm\ts
+1\t0\t0.3487\t3.3464\t0.14602
+1\t30\t0.2500\t4.4000\t0.13000
+2\t0\t0.3809\t3.2322\t0.14171
+"""
+_IMC = """sex\tage\tl\tm\ts\tloh
+1\t0\t-0.3053\t13.4069\t0.0956\tL
+2\t0\t-0.0631\t13.3363\t0.09272\tL
+"""
+
+
+@pytest.fixture
+def motor(tmp_path):
+    (tmp_path / "weianthro.txt").write_text(_PESO, encoding="utf-8")
+    (tmp_path / "bmianthro.txt").write_text(_IMC, encoding="utf-8")
+    return MotorCrecimiento(str(tmp_path))
+
+
+@pytest.mark.parametrize("sexo, valor, esperado", [
+    # Tablas publicadas de peso para la edad al nacer (kg, redondeadas a 0.1):
+    # niños -3 DE 2.1, -2 DE 2.5, mediana 3.3, +2 DE 4.4, +3 DE 5.0; niñas mediana 3.2.
+    # Redondear a 0.1 kg mueve el puntaje hasta ~0.12 DE cerca de -2 DE
+    ("M", 3.3464, 0.0),
+    ("M", 2.5, -2.0),
+    ("M", 4.4, 2.0),
+    ("M", 5.0, 3.0),
+    ("F", 3.2322, 0.0),
+])
+def test_zscore_peso_valores_oms(motor, sexo, valor, esperado):
+    assert motor.zscore("peso", sexo, 0, valor) == pytest.approx(esperado, abs=0.15)
+
+
+def test_zscore_restringido_fuera_de_tres_de(motor):
+    # Fuera de ±3 DE la OMS extrapola con la distancia entre 2 y 3 DE:
+    # +3 DE = 5.031 kg, +2 DE = 4.419 kg, -2 DE = 2.459 kg, -3 DE = 2.080 kg
+    assert motor.zscore("peso", "M", 0, 6.0) == pytest.approx(3 + (6.0 - 5.031) / (5.031 - 4.419), abs=0.01)
+    assert motor.zscore("peso", "M", 0, 1.5) == pytest.approx(-3 + (1.5 - 2.080) / (2.459 - 2.080), abs=0.01)
+    # El IMC también se corrige; la talla no (no está en la tabla de prueba)
+    assert motor.zscore("imc", "M", 0, 13.4069) == pytest.approx(0.0, abs=1e-9)
+
+
+def test_interpolacion_lms(motor):
+    l, m, s = motor.tabla("peso", "M").lms(15)
+    assert (l, m, s) == pytest.approx(((0.3487 + 0.25) / 2, (3.3464 + 4.4) / 2, (0.14602 + 0.13) / 2))
+    # Fuera del rango de la tabla se usa el extremo
+    assert motor.tabla("peso", "M").lms(400) == pytest.approx((0.25, 4.4, 0.13))
+
+
+def test_puntuar_con_numpy_igual_que_fila_por_fila(motor):
+    pytest.importorskip("numpy")
+    sexos = ["M", "F", "1", "2", "", "M", "M", "F"]
+    edades = [0.0, 0.0, 15.0, 0.0, 0.0, 45.0, 0.0, 0.0]
+    valores = [3.3, 3.0, 4.0, 6.5, 3.3, None, 1.5, 0.0]
+    por_fila = [motor.zscore("peso", s, e, v) for s, e, v in zip(sexos, edades, valores)]
+    lote = motor.puntuar("peso", sexos, edades, valores)
+    assert [z is None for z in lote] == [z is None for z in por_fila]
+    assert [z for z in lote if z is not None] == pytest.approx([z for z in por_fila if z is not None])
+    assert motor.percentiles([0.0, None]) == [percentil(0.0), None]
+
+
+def test_disponible_sin_tablas(tmp_path, motor):
+    assert not MotorCrecimiento(str(tmp_path / "no_existe")).disponible("imc")
+    assert motor.disponible("imc") and motor.disponible("peso", "F")
+    assert not motor.disponible("talla")
@@ -0,0 +1,34 @@
+# test_models.py - LactaSegura - Mediciones y registros tipados
+import pytest
+
+from models import Registro
+from storage import BaseDatos
+
+
+def test_guardar_y_editar_dan_el_mismo_texto(tmp_path):
+    db = BaseDatos(str(tmp_path / "lactasegura.db"))
+    try:
+        nuevo = Registro("", "2024-01-01T10:00:00")
+        nuevo.actualizar("Ana", "4", "5,5", "")
+        record = Registro.desde_dict(db.registros.agregar(nuevo.como_dict()))
+        guardado = db.registros.todos()[0]
+        assert (guardado["edad_meses"], guardado["peso_kg"]) == ("4", "5.5")
+
+        # Mismo camino que RegistroLocal.editar_registro
+        record.actualizar("Ana María", "4", "6", "control")
+        db.registros.actualizar(record.como_dict())
+        editado = db.registros.todos()[0]
+        assert editado["nombre"] == "Ana María"
+        assert (editado["edad_meses"], editado["peso_kg"]) == ("4", "6")
+        assert Registro.desde_dict(editado).peso_kg == 6.0
+    finally:
+        db.cerrar()
+
+
+def test_editar_con_numero_invalido_no_cambia_nada():
+    record = Registro("1", "2024-01-01T10:00:00", "Ana", 4.0, 5.5, "")
+    with pytest.raises(ValueError):
+        record.actualizar("Otra", "cuatro", "5", "")
+    assert (record.nombre, record.edad_meses, record.peso_kg) == ("Ana", 4.0, 5.5)
+    record.actualizar("Ana", "", "5.5", "")
+    assert record.como_dict()["edad_meses"] == ""
@@ -0,0 +1,25 @@
+# test_record_index.py - LactaSegura - Índice de los registros locales
+from models import Registro
+from record_index import IndiceRegistros
+
+
+def _registro(rec_id, nombre, edad, peso, dia):
+    return Registro(rec_id, f"2024-01-{dia:02d}T10:00:00", nombre, edad, peso)
+
+
+def test_id_repetido_en_la_carga_inicial():
+    indice = IndiceRegistros([
+        _registro("1", "Ana", 6.0, 7.0, 1),
+        _registro("2", "Bruno", 2.0, 4.5, 2),
+        _registro("1", "Ana María", 3.0, 5.0, 3),
+        _registro("3", "Carla", 9.0, 8.0, 4),
+    ])
+    assert len(indice) == 3
+    # Cada columna tiene una clave por registro y queda ordenada
+    for columna in indice._columnas():
+        assert len(columna) == 3
+        assert columna == sorted(columna)
+    assert indice.buscar("maria") == ["1"]
+    assert indice.buscar("ana") == ["1"]
+    indice.eliminar("1")
+    assert all(len(columna) == 2 for columna in indice._columnas())
@@ -0,0 +1,53 @@
+# test_registros_vista.py - LactaSegura - Diferencias de la lista de registros
+import os
+
+import pytest
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+pytest.importorskip("kivy")
+
+from main import _diferencias_vista  # noqa: E402
+
+
+def _fila(rec_id, texto=None):
+    return {"rec_id": rec_id, "text": texto or f"Registro {rec_id}"}
+
+
+def _aplicar(viejas, nuevas):
+    datos = list(viejas)
+    ops = _diferencias_vista(viejas, nuevas)
+    assert ops is not None
+    for inicio, fin, filas in reversed(ops):
+        datos[inicio:fin] = filas
+    return datos, ops
+
+
+def test_filas_sin_cambios_no_generan_ediciones():
+    filas = [_fila(str(i)) for i in range(5)]
+    assert _diferencias_vista(filas, list(filas)) == []
+
+
+def test_registro_editado_con_el_mismo_id_se_reemplaza():
+    viejas = [_fila(str(i)) for i in range(5)]
+    nuevas = list(viejas)
+    nuevas[2] = _fila("2", "Registro 2 editado")
+    datos, ops = _aplicar(viejas, nuevas)
+    assert ops == [(2, 3, [nuevas[2]])]
+    assert all(a is b for a, b in zip(datos, nuevas))
+
+
+def test_altas_bajas_y_cambios_juntos():
+    viejas = [_fila(str(i)) for i in range(6)]
+    # Se borra el 1, se editan el 3 y el 4 y se agrega el 9 al final
+    nuevas = [viejas[0], viejas[2], _fila("3", "otro"), _fila("4", "otro"), viejas[5], _fila("9")]
+    datos, _ = _aplicar(viejas, nuevas)
+    assert len(datos) == len(nuevas)
+    assert all(a is b for a, b in zip(datos, nuevas))
+
+
+def test_todas_las_filas_nuevas_tras_restaurar():
+    viejas = [_fila(str(i)) for i in range(100)]
+    nuevas = [_fila(str(i)) for i in range(100)]
+    # Los reemplazos contiguos se agrupan en una sola edición
+    assert _diferencias_vista(viejas, nuevas) == [(0, 100, nuevas)]
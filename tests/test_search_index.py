@@ -0,0 +1,33 @@
+# test_search_index.py - LactaSegura - Índice de búsqueda sin conexión
+from search_index import IndiceBusqueda
+
+
+def _ids(indice, consulta):
+    return [doc_id for doc_id, _, _ in indice.buscar(consulta)]
+
+
+def test_reindexar_quita_solo_los_terminos_del_documento(tmp_path):
+    indice = IndiceBusqueda(str(tmp_path / "indice.json"))
+    indice.actualizar([("art:1", "Lactancia materna", "agarre correcto"),
+                       ("art:2", "Desnutrición", "agarre y peso")], prefijo="art:")
+    indice.actualizar([("art:1", "Lactancia materna", "extracción de leche")])
+    assert _ids(indice, "agarre") == ["art:2"]
+    assert _ids(indice, "extraccion") == ["art:1"]
+
+    # Con `vigentes` sólo se pasan los cambiados y los demás se conservan
+    indice.actualizar([("art:3", "Vacunas", "calendario")], prefijo="art:", vigentes={"art:1", "art:3"})
+    assert sorted(indice.docs) == ["art:1", "art:3"]
+    assert "peso" not in indice.postings
+
+
+def test_cargar_reconstruye_los_terminos_por_documento(tmp_path):
+    path = str(tmp_path / "indice.json")
+    indice = IndiceBusqueda(path)
+    indice.actualizar([("art:1", "Lactancia", "agarre"), ("art:2", "Peso", "agarre")])
+    indice.guardar()
+
+    cargado = IndiceBusqueda(path)
+    assert cargado.cargar()
+    cargado.actualizar([("art:1", "Lactancia", "postura")])
+    assert _ids(cargado, "agarre") == ["art:2"]
+    assert _ids(cargado, "postura") == ["art:1"]
@@ -0,0 +1,72 @@
+# test_storage.py - LactaSegura - Base SQLite del historial y los registros
+import sqlite3
+
+import imc
+from storage import BaseDatos, CacheDatos, GuardadoDiferido
+
+
+def _base_anterior(path):
+    # Historial de versiones anteriores: la interpretación completa guardada como texto
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE historial (id INTEGER PRIMARY KEY AUTOINCREMENT, fecha TEXT NOT NULL, "
+                 "peso_kg TEXT NOT NULL DEFAULT '', talla_cm TEXT NOT NULL DEFAULT '', "
+                 "edad_meses TEXT NOT NULL DEFAULT '', imc REAL, interpretacion TEXT NOT NULL DEFAULT '')")
+    texto = imc.interpretacion("normal", 14.0, 3.5, 50.0, 1)
+    conn.execute("INSERT INTO historial (fecha, peso_kg, talla_cm, edad_meses, imc, interpretacion) "
+                 "VALUES ('2024-01-01T10:00:00', '3.5', '50', '1', 14.0, ?)", (texto,))
+    conn.commit()
+    conn.close()
+    return texto
+
+
+def test_interpretaciones_se_migran_una_sola_vez(tmp_path):
+    path = str(tmp_path / "lactasegura.db")
+    texto = _base_anterior(path)
+
+    db = BaseDatos(path)
+    try:
+        assert db.historial.todos()[0]["codigo"] == "normal"
+        assert db.consultar("SELECT interpretacion FROM historial")[0][0] == ""
+        # La fila convertida queda como cambio pendiente de sincronizar
+        assert [c["op"] for c in db.cambios_desde(0)] == ["upsert"]
+        # Una fila con texto escrita después ya no se vuelve a buscar al abrir
+        db.ejecutar("UPDATE historial SET interpretacion = ?", (texto,))
+    finally:
+        db.cerrar()
+
+    db = BaseDatos(path)
+    try:
+        assert db.consultar("SELECT interpretacion FROM historial")[0][0] == texto
+    finally:
+        db.cerrar()
+
+
+def test_cache_ve_escrituras_de_otra_conexion(tmp_path):
+    path = str(tmp_path / "lactasegura.db")
+    db = BaseDatos(path)
+    try:
+        cache = CacheDatos(db)
+        db.registros.agregar({"fecha": "2024-01-01T10:00:00", "nombre": "Ana"})
+        assert [r.nombre for r in cache.registros()] == ["Ana"]
+        assert cache.registros() is cache.registros()
+
+        otra = sqlite3.connect(path)
+        with otra:
+            otra.execute("UPDATE registros SET nombre = 'Ana María'")
+            otra.execute("INSERT INTO historial (fecha) VALUES ('2024-01-02T10:00:00')")
+        otra.close()
+        assert [r.nombre for r in cache.registros()] == ["Ana María"]
+        assert len(cache.historial()) == 1
+    finally:
+        db.cerrar()
+
+
+def test_confirmar_y_esperar_no_pierde_la_pendiente():
+    for _ in range(200):
+        escritas = []
+        guardado = GuardadoDiferido(escritas.append, espera=60)
+        guardado.programar("A")
+        assert guardado.confirmar(esperar=True)
+        guardado.programar("B")
+        guardado.cerrar()
+        assert escritas == ["A", "B"]